@@ -1,29 +1,153 @@
-from flask import Flask, render_template, Response, jsonify
+from flask import Flask, render_template, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
-import threading
-from log_broadcaster import log_queue
+from log_broadcaster import broadcaster
+from log_reader import tail_lines
+from log_archive import get_log_archive
+from history_store import get_history_store, parse_time
+from job_queue import JobQueue
+from runtime import KeeperRuntime
+import json_codec
+import metrics
+import stats
 from main import run_keeper_task
+from scheduling import build_api_schedules, in_time_windows, resolve_api_schedule
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify 与 request.get_json 使用 json_codec 的后端，历史与日志接口的大响应编码更快"""
+    
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps_str(obj, default=self.default)
+    
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
 
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 
 scheduler = BackgroundScheduler()
-task_running = False
-task_lock = threading.Lock()
+runtime = KeeperRuntime('config.yaml')
+last_success = {}
+
+API_JOB_PREFIX = 'keeper_api:'
+
+def record_result(result):
+    if result.get('success'):
+        last_success[result.get('api_name')] = time.time()
+
+def get_last_success(api_name):
+    if api_name in last_success:
+        return last_success[api_name]
+    store = get_store()
+    return store.last_success(api_name) if store else None
+
+def run_job(job):
+    def on_result(result):
+        record_result(result)
+        job_queue.record(job, result)
+    
+    run_keeper_task(api_names=job.apis, on_result=on_result, runtime=runtime, strategy=job.strategy,
+                    use_leases=job.source != 'manual')
+
+def enabled_api_names():
+    runtime.refresh()
+    return [api.get('name') for api in runtime.config_loader.get_apis_config()]
+
+job_queue = JobQueue(run_job, enabled_api_names)
 
 def scheduled_task():
-    global task_running
-    with task_lock:
-        if task_running:
+    # 上一次全量运行尚未开始时合并为同一个任务
+    job_queue.submit(source='schedule')
+
+def scheduled_api_task(api_name):
+    runtime.refresh()
+    config_loader = runtime.config_loader
+    api_config = next((api for api in config_loader.get_apis_config() if api.get('name') == api_name), None)
+    if api_config is None:
+        return
+    
+    schedule = resolve_api_schedule(config_loader.get_schedule_config(), api_config)
+    if not in_time_windows(schedule.get('windows'), datetime.now()):
+        return
+    
+    skip_within = schedule.get('skip_if_success_within', 0)
+    if skip_within:
+        last = get_last_success(api_name)
+        if last is not None and time.time() - last < skip_within:
             return
-        task_running = True
     
-    try:
-        run_keeper_task()
-    finally:
-        with task_lock:
-            task_running = False
+    # 该 API 正在请求或已在排队时跳过本次调度
+    if job_queue.pending(api_name):
+        return
+    job_queue.submit(apis=[api_name], source='schedule')
+
+def setup_schedule():
+    runtime.refresh()
+    sync_schedule(runtime.config_loader)
+    runtime.add_reload_listener(sync_schedule)
+    runtime.demand_provider = upcoming_requests
+
+def upcoming_requests(within):
+    """未来 within 秒内调度将发出的请求数，提示词池只为这些请求预先生成提示词"""
+    horizon = time.time() + within
+    count = 0
+    for job in scheduler.get_jobs():
+        if job.next_run_time is None or job.next_run_time.timestamp() > horizon:
+            continue
+        if job.id == 'keeper_task':
+            count += len(runtime.clients)
+        elif job.id.startswith(API_JOB_PREFIX):
+            count += 1
+    return count
+
+def sync_schedule(config_loader):
+    """按当前配置增删调度任务；间隔与抖动未变的任务保留原有的下次执行时间"""
+    schedule_config = config_loader.get_schedule_config()
+    now = datetime.now()
+    
+    wanted = {}
+    if schedule_config.get('mode', 'batch') != 'per_api':
+        interval = float(schedule_config.get('interval_minutes', 720)) * 60
+        existing = scheduler.get_job('keeper_task')
+        wanted['keeper_task'] = {
+            'func': scheduled_task,
+            'interval': interval,
+            'jitter': None,
+            'args': [],
+            # 启动时立即执行一次；热加载修改间隔时从现在起按新间隔计算
+            'next_run_time': now + timedelta(seconds=interval) if existing else now
+        }
+    else:
+        for plan in build_api_schedules(schedule_config, config_loader.get_apis_config(), now):
+            wanted[f"{API_JOB_PREFIX}{plan['api_name']}"] = {
+                'func': scheduled_api_task,
+                'interval': plan['interval'],
+                'jitter': plan['jitter'],
+                'args': [plan['api_name']],
+                'next_run_time': plan['first_run']
+            }
+    
+    for job in scheduler.get_jobs():
+        if job.id not in wanted and (job.id == 'keeper_task' or job.id.startswith(API_JOB_PREFIX)):
+            scheduler.remove_job(job.id)
+    
+    for job_id, spec in wanted.items():
+        existing = scheduler.get_job(job_id)
+        if (existing is not None and existing.trigger.interval.total_seconds() == spec['interval']
+                and existing.trigger.jitter == spec['jitter']):
+            continue
+        scheduler.add_job(
+            spec['func'],
+            'interval',
+            seconds=spec['interval'],
+            jitter=spec['jitter'],
+            args=spec['args'],
+            id=job_id,
+            next_run_time=spec['next_run_time'],
+            replace_existing=True
+        )
 
 @app.route('/')
 def index():
@@ -31,57 +155,209 @@ def index():
 
 @app.route('/api/trigger', methods=['POST'])
 def trigger_task():
-    global task_running
-    with task_lock:
-        if task_running:
-            return jsonify({'status': 'error', 'message': 'Task is already running'}), 400
+    body = request.get_json(silent=True)
+    if body is None:
+        if request.get_data():
+            # 解析失败时不能退回为全量触发
+            return jsonify({'status': 'error', 'message': 'Request body is not valid JSON'}), 400
+        body = {}
+    if not isinstance(body, dict):
+        return jsonify({'status': 'error', 'message': 'Request body must be a JSON object'}), 400
+    apis = body.get('apis')
+    strategy = body.get('strategy')
+    if strategy is not None and not isinstance(strategy, str):
+        return jsonify({'status': 'error', 'message': 'strategy must be a strategy type name'}), 400
     
-    thread = threading.Thread(target=scheduled_task)
-    thread.daemon = True
-    thread.start()
+    runtime.refresh()
+    config_loader = runtime.config_loader
+    if apis is not None:
+        if not isinstance(apis, list) or not apis or not all(isinstance(name, str) for name in apis):
+            return jsonify({'status': 'error', 'message': 'apis must be a non-empty list of API names'}), 400
+        known = {api.get('name') for api in config_loader.get_apis_config()}
+        unknown = sorted(set(apis) - known)
+        if unknown:
+            return jsonify({'status': 'error', 'message': f"Unknown or disabled API(s): {', '.join(unknown)}"}), 400
+    if strategy is not None:
+        known = {config.get('type') for config in config_loader.get_strategies_config()}
+        if strategy not in known:
+            return jsonify({'status': 'error', 'message': f'Unknown strategy: {strategy}'}), 400
     
-    return jsonify({'status': 'success', 'message': 'Task triggered'})
+    job, coalesced = job_queue.submit(apis=apis, strategy=strategy)
+    return jsonify({
+        'status': 'success',
+        'message': 'Merged into a queued job' if coalesced else 'Task triggered',
+        'job_id': job.id,
+        'coalesced': coalesced,
+        'job': job.to_dict()
+    }), 202
+
+@app.route('/api/jobs')
+def get_jobs():
+    return jsonify({'jobs': [job.to_dict() for job in job_queue.jobs()]})
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
 
 @app.route('/api/status')
 def get_status():
     next_run = scheduler.get_job('keeper_task').next_run_time if scheduler.get_job('keeper_task') else None
+    
+    apis = []
+    for job in scheduler.get_jobs():
+        if not job.id.startswith(API_JOB_PREFIX):
+            continue
+        api_name = job.id[len(API_JOB_PREFIX):]
+        last = last_success.get(api_name)
+        apis.append({
+            'name': api_name,
+            'next_run': job.next_run_time.isoformat() if job.next_run_time else None,
+            'running': job_queue.in_flight(api_name),
+            'last_success': datetime.fromtimestamp(last).isoformat() if last else None
+        })
+        if job.next_run_time and (next_run is None or job.next_run_time < next_run):
+            next_run = job.next_run_time
+    
     return jsonify({
-        'running': task_running,
-        'next_run': next_run.isoformat() if next_run else None
+        'running': job_queue.busy,
+        'next_run': next_run.isoformat() if next_run else None,
+        'apis': sorted(apis, key=lambda api: api['name']),
+        'prompt_pool': runtime.prompt_pool.stats() if runtime.prompt_pool else None
     })
 
 @app.route('/api/logs/history')
 def get_history():
-    from pathlib import Path
+    log_files = {
+        'main': 'logs/newapi_keeper.log',
+        'detail': 'logs/request_details.jsonl'
+    }
     
-    main_log = Path('logs/newapi_keeper.log')
-    detail_log = Path('logs/request_details.jsonl')
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    before = request.args.get('before')
+    log_name = request.args.get('log')
     
-    main_lines = []
-    detail_lines = []
+    if log_name is not None and log_name not in log_files:
+        return jsonify({'status': 'error', 'message': f'Unknown log: {log_name}'}), 400
     
-    if main_log.exists():
-        with open(main_log, 'r', encoding='utf-8') as f:
-            main_lines = f.readlines()[-500:]
+    archives = get_log_archives()
+    names = [log_name] if log_name else list(log_files)
+    result = {}
+    for name in names:
+        try:
+            page = tail_lines(log_files[name], limit, before if log_name else None, archives[name])
+        except ValueError:
+            return jsonify({'status': 'error', 'message': f'Invalid cursor: {before}'}), 400
+        result[name] = [line.strip() for line in page['lines']]
+        result[f'{name}_cursor'] = page['cursor']
     
-    if detail_log.exists():
-        with open(detail_log, 'r', encoding='utf-8') as f:
-            detail_lines = f.readlines()[-500:]
+    return jsonify(result)
+
+def get_log_archives():
+    runtime.refresh()
+    logging_config = runtime.config_loader.get_logging_config()
+    return {
+        'main': get_log_archive(logging_config, 'newapi_keeper'),
+        'detail': get_log_archive(logging_config, 'request_details')
+    }
+
+@app.route('/api/logs/archive')
+def get_archived_logs():
+    log_name = request.args.get('log', 'detail')
+    archives = get_log_archives()
+    if log_name not in archives:
+        return jsonify({'status': 'error', 'message': f'Unknown log: {log_name}'}), 400
+    archive = archives[log_name]
+    if archive is None:
+        return jsonify({'status': 'error', 'message': 'Log archive is not enabled'}), 404
     
-    return jsonify({
-        'main': [line.strip() for line in main_lines],
-        'detail': [line.strip() for line in detail_lines]
-    })
+    try:
+        result = archive.query(
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            api_name=request.args.get('api_name'),
+            limit=min(max(request.args.get('limit', 500, type=int), 1), 5000)
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return jsonify(result)
+
+def format_sse_event(event):
+    lines = f"{event['type']}|{event['message']}".split('\n')
+    data = '\n'.join(f"data: {line}" for line in lines)
+    return f"id: {event['id']}\n{data}\n\n"
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/stats')
+def get_stats():
+    return Response(stats.render(), mimetype='application/json')
+
+def get_store():
+    runtime.refresh()
+    logging_config = runtime.config_loader.get_logging_config()
+    return get_history_store(logging_config.get('history_store', {}))
+
+@app.route('/api/history/requests')
+def get_request_history():
+    store = get_store()
+    if store is None:
+        return jsonify({'status': 'error', 'message': 'History store is not enabled'}), 404
+    
+    success = request.args.get('success')
+    if success is not None:
+        success = success.lower() in ('1', 'true', 'yes')
+    
+    try:
+        page = store.query(
+            api_name=request.args.get('api_name'),
+            success=success,
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            before=request.args.get('before'),
+            limit=min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return jsonify(page)
+
+@app.route('/api/history/summary')
+def get_history_summary():
+    store = get_store()
+    if store is None:
+        return jsonify({'status': 'error', 'message': 'History store is not enabled'}), 404
+    
+    try:
+        since = parse_time(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return jsonify({'apis': store.summary(since)})
 
 @app.route('/api/logs/stream')
 def log_stream():
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None or last_event_id > broadcaster.last_id:
+        # 服务重启后 ID 重新计数，旧游标无效时从当前位置开始
+        last_event_id = broadcaster.last_id
+    
     def generate():
+        cursor = last_event_id
         while True:
-            try:
-                log_data = log_queue.get(timeout=30)
-                yield f"data: {log_data['type']}|{log_data['message']}\n\n"
-            except:
-                yield f"data: ping|heartbeat\n\n"
+            events = broadcaster.wait_for_events(cursor, timeout=30)
+            if not events:
+                yield "data: ping|heartbeat\n\n"
+                continue
+            
+            for event in events:
+                cursor = event['id']
+                yield format_sse_event(event)
     
     return Response(generate(), mimetype='text/event-stream')
 
@@ -92,13 +368,7 @@ if __name__ == '__main__':
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Host to bind (default: 0.0.0.0)')
     args = parser.parse_args()
     
-    scheduler.add_job(
-        scheduled_task,
-        'interval',
-        hours=12,
-        id='keeper_task',
-        next_run_time=datetime.now()
-    )
+    setup_schedule()
     scheduler.start()
     
     app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""测量 main.py（命令行）与 app.py（Web 服务）的冷启动：导入耗时、进程墙钟时间、峰值 RSS 与最慢的模块（JSON）"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+from run_benchmark import ROOT, git_revision, percentile
+
+
+TARGETS = ('main', 'app')
+# 只在特定策略或功能启用时才需要的依赖，冷启动时不应出现在 sys.modules 中
+OPTIONAL_MODULES = ('feedparser', 'bs4', 'httpx', 'zstandard', 'strategies.news_strategy',
+                    'strategies.webpage_strategy')
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - started
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    'import_seconds': elapsed,
+    'max_rss_kb': max_rss // 1024 if sys.platform == 'darwin' else max_rss,
+    'modules': len(sys.modules),
+    'optional_loaded': [name for name in {optional!r} if name in sys.modules]
+}}))
+"""
+
+
+def run_probe(target: str) -> Dict[str, Any]:
+    code = PROBE.format(target=target, optional=OPTIONAL_MODULES)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    sample = json.loads(completed.stdout.strip().splitlines()[-1])
+    sample['process_seconds'] = time.perf_counter() - started
+    return sample
+
+
+def slowest_imports(target: str, top: int) -> List[Dict[str, Any]]:
+    """用 -X importtime 找出累计耗时最长的顶层模块"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # 格式为 "import time: self [us] | cumulative | name"，name 的缩进表示嵌套层级
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        name = name.rstrip()[1:]
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'cumulative_ms': int(cumulative_us) / 1000.0,
+            'self_ms': int(self_us) / 1000.0
+        })
+    top_level = [entry for entry in entries if entry['depth'] <= 1]
+    top_level.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    for entry in top_level:
+        del entry['depth']
+    return top_level[:top]
+
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    imports = [s['import_seconds'] for s in samples]
+    processes = [s['process_seconds'] for s in samples]
+    return {
+        'runs': len(samples),
+        'import_p50': round(percentile(imports, 50), 4),
+        'import_min': round(min(imports), 4),
+        'process_p50': round(percentile(processes, 50), 4),
+        'max_rss_kb': max(s['max_rss_kb'] for s in samples),
+        'modules': samples[-1]['modules'],
+        'optional_loaded': samples[-1]['optional_loaded']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start import time and RSS of the CLI and web app')
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=TARGETS)
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreter runs per target')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest top-level imports to report')
+    parser.add_argument('--output', help='Write JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': []
+    }
+    for target in args.targets:
+        # 先运行一次预热 .pyc 缓存，之后的结果只反映导入本身
+        run_probe(target)
+        entry = summarize([run_probe(target) for _ in range(max(1, args.runs))])
+        entry['target'] = target
+        entry['slowest_imports'] = slowest_imports(target, args.top)
+        report['results'].append(entry)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""对比各 JSON 后端在热路径上的耗时：大 SSE 响应解析、详细日志编码、历史日志扫描与接口响应编码（JSON）"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Dict, Any, Callable, List
+
+from run_benchmark import git_revision
+
+import json_codec  # noqa: E402
+from log_archive import extract_jsonl  # noqa: E402
+from newapi_client import NewAPIClient  # noqa: E402
+
+
+def build_sse_body(chunks: int) -> bytes:
+    lines = []
+    for i in range(chunks):
+        event = {'id': 'chatcmpl-bench', 'object': 'chat.completion.chunk', 'model': 'bench-model',
+                 'choices': [{'index': 0, 'delta': {'content': f'片段 {i} lorem ipsum dolor sit amet '}}]}
+        lines.append(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8'))
+    lines.append(b'data: ' + json.dumps({'choices': [], 'usage': {'prompt_tokens': 8, 'completion_tokens': chunks,
+                                                                   'total_tokens': chunks + 8}}).encode('utf-8'))
+    lines.append(b'data: [DONE]')
+    return b'\n\n'.join(lines) + b'\n\n'
+
+
+def build_log_entries(count: int) -> List[Dict[str, Any]]:
+    return [{
+        'timestamp': f'2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.123456',
+        'api_name': f'API-{i % 50}',
+        'strategy': 'random_question',
+        'prompt': f'第 {i} 个问题：请简要介绍一下 HTTP/2 的多路复用',
+        'response': '多路复用允许在同一个 TCP 连接上并发多个请求与响应。' * 8,
+        'usage': {'prompt_tokens': 20, 'completion_tokens': 180, 'total_tokens': 200},
+        'model': 'bench-model',
+        'timings': {'ttfb': 0.123, 'total': 0.456},
+        'body_bytes': 2048
+    } for i in range(count)]
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_cases(sse_body: bytes, entries: List[Dict[str, Any]], lines: List[str], page: List[str],
+              repeat: int) -> Dict[str, float]:
+    client = NewAPIClient({'name': 'bench', 'url': 'http://127.0.0.1/v1', 'api_key': 'sk-bench',
+                           'model': 'bench-model'})
+    return {
+        'sse_parse': best_of(lambda: client._parse_sse_response(sse_body), repeat),
+        'log_encode': best_of(lambda: [json_codec.dumps_str(entry) for entry in entries], repeat),
+        'history_scan': best_of(lambda: [extract_jsonl(line) for line in lines], repeat),
+        'history_response': best_of(lambda: json_codec.dumps({'detail': page, 'detail_cursor': '0:0'}), repeat)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON codec backends on keeper hot paths')
+    parser.add_argument('--sse-chunks', type=int, default=5000, help='Events in the synthetic SSE body')
+    parser.add_argument('--entries', type=int, default=20000, help='Detail log entries to encode and scan')
+    parser.add_argument('--page', type=int, default=500, help='Lines in one history response')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions per case, the best is reported')
+    parser.add_argument('--output', help='Write JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    sse_body = build_sse_body(args.sse_chunks)
+    entries = build_log_entries(args.entries)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sse_body_bytes': len(sse_body),
+        'results': []
+    }
+    outputs = {}
+    for backend in json_codec.available_backends():
+        json_codec.set_backend(backend)
+        lines = [json_codec.dumps_str(entry) for entry in entries]
+        outputs[backend] = lines[0]
+        cases = run_cases(sse_body, entries, lines, lines[-args.page:], args.repeat)
+        report['results'].append({'backend': backend, **{name: round(value, 5) for name, value in cases.items()}})
+
+    baseline = next((entry for entry in report['results'] if entry['backend'] == 'json'), None)
+    for entry in report['results']:
+        entry['speedup'] = {name: round(baseline[name] / entry[name], 2) for name in entry
+                            if name not in ('backend', 'speedup') and entry[name]}
+    # 各后端编码同一条详细日志的字节序列应完全一致
+    report['identical_output'] = len(set(outputs.values())) == 1
+    json_codec.set_backend()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
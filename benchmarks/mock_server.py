@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""本地 OpenAI 兼容模拟服务：按 URL 中的 profile 名称决定延迟分布、响应格式与故障类型"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any
+
+import yaml
+
+
+DEFAULT_PROFILE = {
+    'latency': {'dist': 'fixed', 'value': 0.0},
+    'body': 'json',
+    'status': 200,
+    'chunks': 4,
+    'chunk_interval': 0.0,
+    'hang': False,
+    'hang_seconds': 5,
+    'truncate': False,
+    'content': 'pong'
+}
+
+
+def sample_latency(latency: Dict[str, Any]) -> float:
+    dist = latency.get('dist', 'fixed')
+    if dist == 'uniform':
+        return random.uniform(latency.get('min', 0.0), latency.get('max', 0.0))
+    if dist == 'lognormal':
+        # 以中位数和形状参数描述长尾延迟
+        median = latency.get('median', 0.05)
+        return median * random.lognormvariate(0, latency.get('sigma', 0.5))
+    if dist == 'exponential':
+        return random.expovariate(1.0 / max(latency.get('mean', 0.05), 1e-6))
+    return latency.get('value', 0.0)
+
+
+def load_profiles(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        scenario = yaml.safe_load(f) or {}
+    profiles = scenario.get('profiles', scenario)
+    return {name: dict(DEFAULT_PROFILE, **(profile or {})) for name, profile in profiles.items()}
+
+
+def completion_body(model: str, content: str) -> Dict[str, Any]:
+    return {
+        'id': 'chatcmpl-mock',
+        'object': 'chat.completion',
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 8, 'completion_tokens': 2, 'total_tokens': 10}
+    }
+
+
+def sse_events(model: str, content: str, chunks: int):
+    size = max(1, -(-len(content) // max(1, chunks)))
+    for i in range(0, len(content), size):
+        yield {'model': model, 'choices': [{'index': 0, 'delta': {'content': content[i:i + size]}}]}
+    yield {'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+           'usage': {'prompt_tokens': 8, 'completion_tokens': 2, 'total_tokens': 10}}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    profiles: Dict[str, Dict[str, Any]] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _profile(self) -> Dict[str, Any]:
+        # 路径形如 /<profile>/v1/chat/completions
+        name = self.path.strip('/').split('/', 1)[0]
+        return self.profiles.get(name, DEFAULT_PROFILE)
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json',
+              declared_length: int = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(declared_length if declared_length is not None else len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+        self.wfile.flush()
+
+    def do_GET(self):
+        self._send(200, json.dumps({'object': 'list', 'data': [{'id': 'mock-model'}]}).encode('utf-8'))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            payload = {}
+
+        profile = self._profile()
+        model = payload.get('model', 'mock-model')
+        time.sleep(max(0.0, sample_latency(profile['latency'])))
+
+        if profile['hang']:
+            # 保持连接不返回任何数据，随后直接断开
+            time.sleep(profile['hang_seconds'])
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+
+        status = profile['status']
+        if status >= 400:
+            body = json.dumps({'error': {'message': f'mock status {status}', 'type': 'mock_error'}})
+            self._send(status, body.encode('utf-8'))
+            return
+
+        body_type = profile['body']
+        if body_type == 'sse' or (body_type == 'auto' and payload.get('stream')):
+            self._stream(profile, model)
+            return
+
+        if body_type == 'data_prefixed':
+            # 非流式请求却返回 data: 前缀的 SSE 文本
+            lines = [f"data: {json.dumps(event)}" for event in sse_events(model, profile['content'], profile['chunks'])]
+            body = ('\n\n'.join(lines) + '\n\ndata: [DONE]\n\n').encode('utf-8')
+            content_type = 'text/plain'
+        else:
+            body = json.dumps(completion_body(model, profile['content'])).encode('utf-8')
+            content_type = 'application/json'
+
+        if profile['truncate']:
+            self.close_connection = True
+            self._send(status, body[:len(body) // 2], content_type, declared_length=len(body))
+            return
+        self._send(status, body, content_type)
+
+    def _stream(self, profile: Dict[str, Any], model: str):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        events = list(sse_events(model, profile['content'], profile['chunks']))
+        if profile['truncate']:
+            # 发送一半事件后断开，不发送 [DONE] 和结束块
+            for event in events[:max(1, len(events) // 2)]:
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.close_connection = True
+            return
+
+        for event in events:
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            if profile['chunk_interval']:
+                time.sleep(profile['chunk_interval'])
+        self._write_chunk(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen() 在构造时调用，积压队列长度必须在类上设置
+    request_queue_size = 1024
+
+
+def start_server(profiles: Dict[str, Dict[str, Any]], host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    handler = type('ScenarioHandler', (MockHandler,), {'profiles': profiles})
+    server = MockServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI-compatible mock server for benchmarks')
+    parser.add_argument('--scenario', help='YAML file with a profiles section')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.scenario) if args.scenario else {}
+    server = start_server(profiles, args.host, args.port)
+    # 第一行输出实际端口，供驱动脚本读取
+    print(server.server_address[1], flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
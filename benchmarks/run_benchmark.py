@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""对 N 个模拟 API 执行 run_keeper_task，输出耗时、吞吐、延迟分位数、CPU 与峰值内存（JSON）"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from runtime import KeeperRuntime  # noqa: E402
+from main import run_keeper_task  # noqa: E402
+
+
+def percentile(values: List[float], q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def assign_profiles(profiles: Dict[str, Dict[str, Any]], count: int) -> List[str]:
+    """按 weight 比例把 count 个 API 分配到各个 profile，结果确定且交错排列"""
+    weights = {name: float(profile.get('weight', 1)) for name, profile in profiles.items()}
+    total = sum(weights.values()) or 1.0
+    assigned = []
+    credit = {name: 0.0 for name in weights}
+    for _ in range(count):
+        for name, weight in weights.items():
+            credit[name] += weight / total
+        name = max(credit, key=credit.get)
+        credit[name] -= 1.0
+        assigned.append(name)
+    return assigned
+
+
+def build_config(scenario: Dict[str, Any], port: int, count: int, workdir: Path, log_level: str) -> Path:
+    profiles = scenario['profiles']
+    apis = []
+    for index, name in enumerate(assign_profiles(profiles, count)):
+        api = {
+            'name': f'bench-{index:05d}-{name}',
+            'url': f'http://127.0.0.1:{port}/{name}/v1',
+            'api_key': 'sk-bench',
+            'model': 'mock-model',
+            'max_tokens': 8
+        }
+        api.update(profiles[name].get('api', {}))
+        apis.append(api)
+
+    config = {
+        'apis': apis,
+        'request_strategies': [{
+            'type': 'random_question',
+            'enabled': True,
+            'priority': 1,
+            'config': {'question_templates': ['benchmark question {n}'], 'variables': {'n': [1, 1000]}}
+        }],
+        'logging': {'path': str(workdir / 'logs'), 'level': log_level}
+    }
+    for section in ('concurrency', 'retry', 'circuit_breaker', 'http_pool', 'strategy_race'):
+        if section in scenario:
+            config[section] = scenario[section]
+    if 'logging' in scenario:
+        config['logging'].update(scenario['logging'])
+    if 'circuit_breaker' in config:
+        config['circuit_breaker'] = dict(config['circuit_breaker'], state_path=str(workdir / 'circuit_state.json'))
+
+    path = workdir / 'config.yaml'
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return path
+
+
+def start_mock_server(scenario_path: Path) -> Tuple[subprocess.Popen, int]:
+    # 模拟服务运行在独立进程中，避免其 CPU 与内存计入被测进程
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve().parent / 'mock_server.py'), '--scenario', str(scenario_path)],
+        stdout=subprocess.PIPE, text=True
+    )
+    port = int(process.stdout.readline().strip())
+    return process, port
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_once(runtime: KeeperRuntime) -> Dict[str, Any]:
+    results = []
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    run_keeper_task(on_result=results.append, runtime=runtime)
+    wall = time.perf_counter() - started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    latencies = [r['latency'] for r in results if r.get('latency') is not None]
+    outcomes = {}
+    for r in results:
+        outcome = 'success' if r.get('success') else r.get('error_type', 'error')
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    return {
+        'requests': len(results),
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(results) / wall, 2) if wall > 0 else None,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p99': percentile(latencies, 99),
+        'latency_max': max(latencies) if latencies else None,
+        'cpu_user_seconds': round(usage_after.ru_utime - usage_before.ru_utime, 4),
+        'cpu_system_seconds': round(usage_after.ru_stime - usage_before.ru_stime, 4),
+        'outcomes': outcomes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark run_keeper_task against a local mock gateway')
+    parser.add_argument('--scenario', default=str(Path(__file__).resolve().parent / 'scenarios' / 'baseline.yaml'))
+    parser.add_argument('--apis', type=int, nargs='+', default=[10, 100],
+                        help='Number of synthetic APIs, one benchmark per value')
+    parser.add_argument('--runs', type=int, default=1, help='Runs per API count (runtime reused between runs)')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', help='Write JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    scenario_path = Path(args.scenario).resolve()
+    with open(scenario_path, 'r', encoding='utf-8') as f:
+        scenario = yaml.safe_load(f)
+
+    server, port = start_mock_server(scenario_path)
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenario': scenario_path.name,
+        'results': []
+    }
+    try:
+        for count in args.apis:
+            with tempfile.TemporaryDirectory(prefix='keeper-bench-') as tmp:
+                workdir = Path(tmp)
+                config_path = build_config(scenario, port, count, workdir, args.log_level)
+                runtime = KeeperRuntime(str(config_path))
+                for run in range(args.runs):
+                    entry = run_once(runtime)
+                    entry.update({'apis': count, 'run': run + 1})
+                    report['results'].append(entry)
+    finally:
+        server.terminate()
+        server.wait()
+
+    # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节；为整个进程生命周期内的峰值
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report['peak_rss_kb'] = max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# 这些错误说明端点本身不可用，计入熔断；4xx 与解析错误说明端点仍有响应，不计入
+BREAKER_ERROR_TYPES = {'ssl', 'timeout', 'connection'}
+RETRYABLE_ERROR_TYPES = {'timeout', 'connection'}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(result: Dict[str, Any]) -> bool:
+    error_type = result.get('error_type')
+    if error_type in RETRYABLE_ERROR_TYPES:
+        return True
+    return error_type == 'http' and result.get('status_code') in RETRYABLE_STATUS_CODES
+
+
+def counts_as_breaker_failure(result: Dict[str, Any]) -> bool:
+    error_type = result.get('error_type')
+    if error_type in BREAKER_ERROR_TYPES:
+        return True
+    return error_type == 'http' and result.get('status_code', 0) >= 500
+
+
+class CircuitBreaker:
+    """按 API 名称或 host 维护熔断状态（closed/open/half_open），状态持久化到 JSON 文件"""
+    
+    def __init__(self, state_path, failure_threshold: int = 3, cooldown: float = 300,
+                 max_cooldown: float = 3600):
+        self.state_path = Path(state_path)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.key_by = 'name'
+        self.probe_timeout = 5
+        self._lock = threading.Lock()
+        self._states = self._load()
+    
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(self.state_path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._states, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+    
+    def _get(self, key: str) -> Dict[str, Any]:
+        return self._states.setdefault(key, {
+            'state': CLOSED,
+            'failures': 0,
+            'opened_at': None,
+            'cooldown': self.cooldown
+        })
+    
+    def before_request(self, key: str) -> str:
+        """返回本次请求应采取的状态：closed 正常请求，half_open 先探测，open 直接跳过"""
+        with self._lock:
+            entry = self._get(key)
+            if entry['state'] == OPEN:
+                if time.time() - (entry['opened_at'] or 0) < entry['cooldown']:
+                    return OPEN
+                entry['state'] = HALF_OPEN
+                self._save()
+            return entry['state']
+    
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            entry = self._get(key)
+            if entry['state'] == CLOSED and entry['failures'] == 0:
+                return
+            entry.update({'state': CLOSED, 'failures': 0, 'opened_at': None, 'cooldown': self.cooldown})
+            self._save()
+    
+    def record_failure(self, key: str) -> None:
+        with self._lock:
+            entry = self._get(key)
+            entry['failures'] += 1
+            if entry['state'] == HALF_OPEN:
+                # 探测失败，冷却时间翻倍
+                entry['cooldown'] = min(entry['cooldown'] * 2, self.max_cooldown)
+                entry['state'] = OPEN
+                entry['opened_at'] = time.time()
+            elif entry['failures'] >= self.failure_threshold:
+                entry['state'] = OPEN
+                entry['opened_at'] = time.time()
+            self._save()
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return json.loads(json.dumps(self._states))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(config: Dict[str, Any]) -> Optional[CircuitBreaker]:
+    if not config.get('enabled', False):
+        return None
+    
+    path = config.get('state_path', './logs/circuit_state.json')
+    key = str(Path(path).resolve())
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(path)
+            _breakers[key] = breaker
+        breaker.failure_threshold = config.get('failure_threshold', 3)
+        breaker.cooldown = config.get('cooldown', 300)
+        breaker.max_cooldown = config.get('max_cooldown', 3600)
+        breaker.key_by = config.get('key', 'name')
+        breaker.probe_timeout = config.get('probe_timeout', 5)
+        return breaker
@@ -44,6 +44,62 @@ class ConfigLoader:
     def get_strategies_config(self) -> list:
         return self.config.get('request_strategies', [])
 
+    def get_schedule_config(self) -> Dict[str, Any]:
+        return self.config.get('schedule', {
+            'mode': 'batch',
+            'interval_minutes': 720
+        })
+
+    def get_concurrency_config(self) -> Dict[str, Any]:
+        return self.config.get('concurrency', {
+            'enabled': False,
+            'max_workers': 10,
+            'per_host': 4
+        })
+
+    def get_strategy_race_config(self) -> Dict[str, Any]:
+        return self.config.get('strategy_race', {
+            'enabled': False,
+            'deadline': 5
+        })
+
+    def get_retry_config(self) -> Dict[str, Any]:
+        return self.config.get('retry', {
+            'max_attempts': 1,
+            'base_delay': 1.0,
+            'max_delay': 10.0
+        })
+
+    def get_circuit_breaker_config(self) -> Dict[str, Any]:
+        return self.config.get('circuit_breaker', {
+            'enabled': False
+        })
+
+    def get_prompt_pool_config(self) -> Dict[str, Any]:
+        return self.config.get('prompt_pool', {
+            'enabled': False,
+            'capacity': 20,
+            'max_age': 600
+        })
+
+    def get_deadline_config(self) -> Dict[str, Any]:
+        return self.config.get('deadline', {
+            'enabled': False,
+            'budget': 600,
+            'prompt_share': 0.2
+        })
+
+    def get_sharding_config(self) -> Dict[str, Any]:
+        return self.config.get('sharding', {
+            'enabled': False
+        })
+
+    def get_http_pool_config(self) -> Dict[str, Any]:
+        return self.config.get('http_pool', {
+            'pool_size': 10,
+            'idle_timeout': 300
+        })
+
     def get_logging_config(self) -> Dict[str, Any]:
         return self.config.get('logging', {
             'path': './logs',
@@ -0,0 +1,71 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """一次运行的时间预算；budget 为空时不限时。各阶段从中切出子预算，请求超时取剩余预算与自身上限的较小值"""
+
+    def __init__(self, budget: Optional[float] = None, min_request_timeout: float = 1.0,
+                 parent: Optional['Deadline'] = None):
+        now = time.monotonic()
+        self.budget = budget
+        self.min_request_timeout = min_request_timeout
+        self.parent = parent
+        self.expires_at = now + budget if budget is not None else None
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+        self._cancelled = threading.Event()
+
+    @property
+    def limited(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数，不限时返回 None；已取消时返回 0"""
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def exhausted(self) -> bool:
+        """剩余预算已不足以发起一次请求"""
+        remaining = self.remaining()
+        return remaining is not None and remaining < self.min_request_timeout
+
+    def phase(self, share: Optional[float]) -> 'Deadline':
+        """切出一个阶段预算：share 为占总预算的比例，阶段结束时间不晚于整体截止时间"""
+        if self.budget is None or share is None:
+            return Deadline(None, self.min_request_timeout, parent=self)
+        return Deadline(self.budget * share, self.min_request_timeout, parent=self)
+
+    def timeout(self, limit: float) -> float:
+        """单个请求的超时：不超过 limit 与剩余预算；剩余预算不足 min_request_timeout 时抛出 DeadlineExceeded"""
+        remaining = self.remaining()
+        if remaining is None:
+            return limit
+        if remaining < self.min_request_timeout:
+            raise DeadlineExceeded(f"Run deadline exceeded ({remaining:.1f}s left)")
+        return min(limit, remaining)
+
+
+def get_deadline(config: Dict[str, Any]) -> Deadline:
+    if not config.get('enabled', False):
+        return Deadline(None)
+    return Deadline(float(config.get('budget', 600)), float(config.get('min_request_timeout', 1.0)))
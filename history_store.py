@@ -0,0 +1,287 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    api_name TEXT NOT NULL,
+    model TEXT,
+    strategy TEXT,
+    success INTEGER NOT NULL,
+    latency REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    error_class TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_requests_api_time ON requests (api_name, timestamp);
+CREATE INDEX IF NOT EXISTS idx_requests_time ON requests (timestamp);
+CREATE INDEX IF NOT EXISTS idx_requests_api_success_time ON requests (api_name, success, timestamp);
+"""
+
+INSERT_SQL = """
+INSERT INTO requests (timestamp, api_name, model, strategy, success, latency,
+                      prompt_tokens, completion_tokens, total_tokens, error_class, error)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COLUMNS = ['id', 'timestamp', 'api_name', 'model', 'strategy', 'success', 'latency',
+           'prompt_tokens', 'completion_tokens', 'total_tokens', 'error_class', 'error']
+
+
+def parse_time(value) -> Optional[float]:
+    """接受 Unix 时间戳或 ISO 8601 字符串"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def format_time(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value).isoformat()
+
+
+class HistoryStore:
+    """SQLite 请求历史：记录每次请求（成功与失败），后台线程批量写入"""
+    
+    _STOP = object()
+    
+    def __init__(self, path, batch_size: int = 200, flush_interval: float = 1.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._dropped = 0
+        self._closed = False
+        
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        
+        self._thread = threading.Thread(target=self._run, name='history-store', daemon=True)
+        self._thread.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def _fetchall(self, sql: str, params) -> List[tuple]:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    
+    def record(self, strategy_type: Optional[str], result: Dict[str, Any]) -> None:
+        if self._closed:
+            return
+        
+        usage = result.get('usage') or {}
+        row = (
+            result.get('timestamp', time.time()),
+            result.get('api_name', 'Unknown'),
+            result.get('model'),
+            strategy_type,
+            1 if result.get('success') else 0,
+            result.get('latency'),
+            usage.get('prompt_tokens'),
+            usage.get('completion_tokens'),
+            usage.get('total_tokens'),
+            None if result.get('success') else result.get('error_type', 'unknown'),
+            None if result.get('success') else result.get('error')
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._dropped += 1
+    
+    def _run(self) -> None:
+        conn = None
+        try:
+            while True:
+                rows = []
+                stop = False
+                deadline = time.monotonic() + self.flush_interval
+                
+                while len(rows) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stop = True
+                        break
+                    rows.append(item)
+                
+                if rows:
+                    try:
+                        if conn is None:
+                            conn = self._connect()
+                        with conn:
+                            conn.executemany(INSERT_SQL, rows)
+                    except Exception as e:
+                        # 数据库被锁定、损坏或磁盘已满时丢弃本批记录，下一批重新连接，写线程不能因此退出
+                        self._dropped += len(rows)
+                        logging.getLogger('newapi_keeper').error(
+                            f"Failed to write {len(rows)} request(s) to history store: {str(e)}"
+                        )
+                        conn = self._discard(conn)
+                
+                if stop:
+                    return
+        finally:
+            if conn is not None:
+                conn.close()
+    
+    @staticmethod
+    def _discard(conn: Optional[sqlite3.Connection]) -> None:
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        return None
+    
+    def close(self, timeout: Optional[float] = 10) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+    
+    def query(self, api_name: Optional[str] = None, success: Optional[bool] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              before: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """按时间倒序分页查询，游标格式为 '<timestamp>:<id>'，可直接走 (api_name, timestamp) 索引"""
+        clauses = []
+        params: List[Any] = []
+        if api_name:
+            clauses.append('api_name = ?')
+            params.append(api_name)
+        if success is not None:
+            clauses.append('success = ?')
+            params.append(1 if success else 0)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        if before:
+            before_ts, before_id = before.rsplit(':', 1)
+            clauses.append('(timestamp < ? OR (timestamp = ? AND id < ?))')
+            params.extend([float(before_ts), float(before_ts), int(before_id)])
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = f"SELECT {', '.join(COLUMNS)} FROM requests {where} ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        rows = self._fetchall(sql, params)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = f"{last[1]!r}:{last[0]}"
+        
+        items = []
+        for row in rows[:limit]:
+            item = dict(zip(COLUMNS, row))
+            item['success'] = bool(item['success'])
+            item['timestamp'] = format_time(item['timestamp'])
+            items.append(item)
+        
+        return {
+            'items': items,
+            'next_cursor': next_cursor
+        }
+    
+    def summary(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """按 API 汇总请求次数、成功率、最近成功时间、平均延迟与 token 用量"""
+        where = 'WHERE timestamp >= ?' if since is not None else ''
+        params = [since] if since is not None else []
+        sql = f"""
+            SELECT api_name,
+                   COUNT(*),
+                   SUM(success),
+                   MAX(timestamp),
+                   MAX(CASE WHEN success = 1 THEN timestamp END),
+                   AVG(latency),
+                   SUM(COALESCE(total_tokens, 0))
+            FROM requests {where}
+            GROUP BY api_name
+            ORDER BY api_name
+        """
+        
+        rows = self._fetchall(sql, params)
+        
+        return [{
+            'api_name': api_name,
+            'total': total,
+            'succeeded': succeeded or 0,
+            'failed': total - (succeeded or 0),
+            'success_rate': (succeeded or 0) / total if total else None,
+            'last_attempt': format_time(last_attempt),
+            'last_success': format_time(last_success),
+            'avg_latency': avg_latency,
+            'total_tokens': total_tokens
+        } for api_name, total, succeeded, last_attempt, last_success, avg_latency, total_tokens in rows]
+    
+    def last_success(self, api_name: str) -> Optional[float]:
+        rows = self._fetchall(
+            'SELECT MAX(timestamp) FROM requests WHERE api_name = ? AND success = 1',
+            (api_name,)
+        )
+        return rows[0][0] if rows else None
+
+
+_stores: Dict[str, HistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store(config: Dict[str, Any]) -> Optional[HistoryStore]:
+    if not config.get('enabled', False):
+        return None
+    
+    path = config.get('path', './logs/history.db')
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = HistoryStore(
+                path,
+                batch_size=config.get('batch_size', 200),
+                flush_interval=config.get('flush_interval', 1.0)
+            )
+            _stores[key] = store
+        return store
+
+
+def close_all() -> None:
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+atexit.register(close_all)
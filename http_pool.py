@@ -0,0 +1,174 @@
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 300
+TRANSPORTS = ('requests', 'httpx')
+
+
+_timings = threading.local()
+
+
+def reset_request_timings() -> Dict[str, Any]:
+    """为当前线程开始一次新的计时，返回可继续写入的计时字典"""
+    _timings.current = {}
+    return _timings.current
+
+
+def current_request_timings() -> Dict[str, Any]:
+    current = getattr(_timings, 'current', None)
+    if current is None:
+        current = reset_request_timings()
+    return current
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            current_request_timings()['connect'] = time.perf_counter() - started
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            current_request_timings()['connect'] = time.perf_counter() - started
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        timings = current_request_timings()
+        # HTTPS 建连总耗时减去 TCP 建连即为 TLS 握手耗时
+        timings['tls'] = max(0.0, time.perf_counter() - started - timings.get('connect', 0.0))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """新建连接时记录 TCP 建连与 TLS 握手耗时；复用连接时不产生这两项"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+
+class SessionPool:
+    """按传输方式与 scheme+host 复用会话，跨多次运行保持长连接"""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.transport = 'requests'
+        self.http2 = False
+        self._sessions: Dict[Tuple[str, bool, str, str], Any] = {}
+        self._last_used: Dict[Tuple[str, bool, str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        pool_size = int(config.get('pool_size', DEFAULT_POOL_SIZE))
+        idle_timeout = float(config.get('idle_timeout', DEFAULT_IDLE_TIMEOUT))
+        transport = config.get('transport', 'requests')
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown http_pool transport: {transport}")
+
+        with self._lock:
+            if pool_size != self.pool_size or idle_timeout != self.idle_timeout:
+                # 连接池大小只在创建 adapter 时生效，需重建已有 session
+                self._close_all_locked()
+            self.pool_size = pool_size
+            self.idle_timeout = idle_timeout
+            self.transport = transport
+            self.http2 = bool(config.get('http2', False))
+
+    def _create_session(self, transport: str, http2: bool):
+        if transport == 'httpx':
+            # 仅在选用 httpx 时导入，未安装 httpx 也不影响默认传输
+            from httpx_transport import HTTPXSession
+            return HTTPXSession(http2=http2, pool_size=self.pool_size, idle_timeout=self.idle_timeout)
+
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_session(self, url: str, transport: Optional[str] = None, http2: Optional[bool] = None):
+        """transport/http2 为 None 时使用 http_pool 中的全局设置；HTTP/2 只对 httpx 传输生效"""
+        transport = transport or self.transport
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        http2 = transport == 'httpx' and (self.http2 if http2 is None else bool(http2))
+
+        parsed = urlparse(url)
+        key = (transport, http2, parsed.scheme.lower(), parsed.netloc.lower())
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle_locked(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session(transport, http2)
+                self._sessions[key] = session
+            self._last_used[key] = now
+            return session
+
+    def _evict_idle_locked(self, now: float) -> None:
+        if self.idle_timeout <= 0:
+            return
+
+        expired = [key for key, last_used in self._last_used.items()
+                   if now - last_used > self.idle_timeout]
+        for key in expired:
+            session = self._sessions.pop(key, None)
+            self._last_used.pop(key, None)
+            if session is not None:
+                session.close()
+
+    def _close_all_locked(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+        self._last_used.clear()
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._close_all_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hosts': len(self._sessions),
+                'pool_size': self.pool_size,
+                'idle_timeout': self.idle_timeout,
+                'transport': self.transport,
+                'http2': self.http2
+            }
+
+
+session_pool = SessionPool()
+
+
+def get_session(url: str, transport: Optional[str] = None, http2: Optional[bool] = None):
+    return session_pool.get_session(url, transport, http2)
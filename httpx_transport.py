@@ -0,0 +1,138 @@
+import ssl
+import time
+from datetime import timedelta
+from typing import Dict, Any, Optional
+
+import httpx
+import requests
+
+from http_pool import current_request_timings
+
+
+def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    """httpcore 的 trace 回调，记录 TCP 建连与 TLS 握手耗时，与 TimedHTTPAdapter 写入相同的计时字段"""
+    timings = current_request_timings()
+    if event_name == 'connection.connect_tcp.started':
+        timings['_connect_started'] = time.perf_counter()
+    elif event_name == 'connection.connect_tcp.complete':
+        timings['connect'] = time.perf_counter() - timings.pop('_connect_started', time.perf_counter())
+    elif event_name == 'connection.start_tls.started':
+        timings['_tls_started'] = time.perf_counter()
+    elif event_name == 'connection.start_tls.complete':
+        timings['tls'] = time.perf_counter() - timings.pop('_tls_started', time.perf_counter())
+    elif event_name == 'connection.connect_tcp.failed':
+        # 建连或握手失败时没有 complete 事件，丢弃起始时间，避免写入计时结果
+        timings.pop('_connect_started', None)
+    elif event_name == 'connection.start_tls.failed':
+        timings.pop('_tls_started', None)
+
+
+def _is_ssl_error(exc: BaseException) -> bool:
+    while exc is not None:
+        if isinstance(exc, ssl.SSLError):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def map_exception(exc: httpx.HTTPError, reading_body: bool = False) -> Exception:
+    """把 httpx 异常转换为对应的 requests 异常，使 NewAPIClient 的错误分类保持不变"""
+    if isinstance(exc, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(exc))
+    if reading_body and isinstance(exc, (httpx.RemoteProtocolError, httpx.ReadError)):
+        return requests.exceptions.ChunkedEncodingError(str(exc))
+    if _is_ssl_error(exc):
+        return requests.exceptions.SSLError(str(exc))
+    if isinstance(exc, (httpx.NetworkError, httpx.ProtocolError, httpx.ProxyError)):
+        return requests.exceptions.ConnectionError(str(exc))
+    return requests.exceptions.RequestException(str(exc))
+
+
+class HTTPXResponse:
+    """提供 NewAPIClient 用到的 requests.Response 属性与方法"""
+    
+    def __init__(self, response: httpx.Response, elapsed: timedelta):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        # 与 requests 一致：elapsed 为发出请求到收到响应头的耗时
+        self.elapsed = elapsed
+    
+    def _read(self) -> httpx.Response:
+        # stream=True 时响应体尚未读取；与 requests 一致，首次访问 content/text 时再读取
+        try:
+            self._response.content
+        except httpx.ResponseNotRead:
+            try:
+                self._response.read()
+            except httpx.HTTPError as e:
+                raise map_exception(e, reading_body=True) from e
+        return self._response
+    
+    @property
+    def content(self) -> bytes:
+        return self._read().content
+    
+    @property
+    def text(self) -> str:
+        return self._read().text
+    
+    def json(self) -> Any:
+        return self._read().json()
+    
+    def iter_lines(self):
+        try:
+            for line in self._response.iter_lines():
+                yield line.encode('utf-8')
+        except httpx.HTTPError as e:
+            raise map_exception(e, reading_body=True) from e
+    
+    def close(self) -> None:
+        self._response.close()
+
+
+class HTTPXSession:
+    """以 requests.Session 的接口包装 httpx.Client；开启 http2 后同一 host 的并发请求复用一个连接"""
+    
+    def __init__(self, http2: bool = False, pool_size: int = 10, idle_timeout: Optional[float] = None):
+        self.http2 = http2
+        self.client = httpx.Client(
+            http2=http2,
+            # 与 requests 的非阻塞连接池一致：连接数不设上限，只限制保留的空闲连接数
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=idle_timeout
+            ),
+            follow_redirects=True
+        )
+    
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, json: Any = None,
+                data: Optional[bytes] = None, timeout: Optional[float] = None,
+                stream: bool = False) -> HTTPXResponse:
+        started = time.perf_counter()
+        try:
+            request = self.client.build_request(method, url, headers=headers, json=json, content=data,
+                                                timeout=timeout,
+                                                extensions={'trace': _trace})
+            response = self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise map_exception(e) from e
+        elapsed = timedelta(seconds=time.perf_counter() - started)
+        
+        if not stream:
+            try:
+                response.read()
+            except httpx.HTTPError as e:
+                response.close()
+                raise map_exception(e, reading_body=True) from e
+        return HTTPXResponse(response, elapsed)
+    
+    def get(self, url: str, **kwargs) -> HTTPXResponse:
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url: str, **kwargs) -> HTTPXResponse:
+        return self.request('POST', url, **kwargs)
+    
+    def close(self) -> None:
+        self.client.close()
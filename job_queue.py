@@ -0,0 +1,180 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """一次保活任务：apis 为空表示全部 API，strategy 为空表示按配置的策略顺序"""
+
+    def __init__(self, job_id: str, apis: Optional[List[str]], strategy: Optional[str], source: str):
+        self.id = job_id
+        self.apis = sorted(set(apis)) if apis else None
+        self.strategy = strategy
+        self.source = source
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.total = len(self.apis) if self.apis else None
+        # 运行中尚未得到结果的 API；为 None 表示全部 API
+        self.remaining = set(self.apis) if self.apis else None
+        self.succeeded = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.error = None
+        self.results: List[Dict[str, Any]] = []
+
+    @property
+    def key(self):
+        return (tuple(self.apis) if self.apis else None, self.strategy)
+
+    def conflicts(self, apis) -> bool:
+        """apis 为 None 表示全部 API；运行中的任务只按尚未完成的 API 判断是否重叠"""
+        targets = self.remaining if self.status == RUNNING else (set(self.apis) if self.apis else None)
+        if targets is None:
+            return True
+        if apis is None:
+            return bool(targets)
+        return not targets.isdisjoint(apis)
+
+    def record(self, result: Dict[str, Any]) -> None:
+        if self.remaining is not None:
+            self.remaining.discard(result.get('api_name'))
+        if result.get('success'):
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.results.append({
+            'api_name': result.get('api_name'),
+            'success': bool(result.get('success')),
+            'error_type': result.get('error_type'),
+            'latency': result.get('latency'),
+            'probe_tier': result.get('probe_tier')
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'apis': self.apis,
+            'strategy': self.strategy,
+            'source': self.source,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'total': self.total,
+            'completed': self.succeeded + self.failed,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'error': self.error,
+            'results': list(self.results)
+        }
+
+
+class JobQueue:
+    """合并重复触发的任务队列：相同目标的排队任务只保留一个；与运行中任务未完成的 API 不重叠的任务立即并发执行"""
+
+    def __init__(self, runner: Callable[[Job], None], resolve_apis: Optional[Callable[[], List[str]]] = None,
+                 history: int = 100):
+        self.runner = runner
+        self.resolve_apis = resolve_apis
+        self.history = history
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._queue: List[Job] = []
+        self._running: List[Job] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, apis: Optional[List[str]] = None, strategy: Optional[str] = None,
+               source: str = 'manual'):
+        """提交任务，返回 (job, coalesced)；已有相同目标的任务在排队时直接返回该任务"""
+        with self._lock:
+            candidate = Job(f"job-{int(time.time())}-{next(self._ids)}", apis, strategy, source)
+            for job in self._queue:
+                if job.key == candidate.key:
+                    job.coalesced += 1
+                    return job, True
+
+            self._queue.append(candidate)
+            self._jobs[candidate.id] = candidate
+            self._start_ready()
+            return candidate, False
+
+    def _start_ready(self) -> None:
+        ahead = []
+        for job in list(self._queue):
+            blocked = any(other.conflicts(job.apis) for other in self._running)
+            # 手动触发的任务可以越过排队中的任务；调度产生的任务按顺序等待，避免排队的全量任务一直被插队
+            if not blocked and job.source != 'manual':
+                blocked = any(other.conflicts(job.apis) for other in ahead)
+            if blocked:
+                ahead.append(job)
+                continue
+            
+            self._queue.remove(job)
+            self._running.append(job)
+            job.status = RUNNING
+            job.started_at = time.time()
+            if job.apis is None and self.resolve_apis is not None:
+                job.remaining = set(self.resolve_apis())
+                job.total = len(job.remaining)
+            threading.Thread(target=self._run, args=(job,), name=f'keeper-{job.id}', daemon=True).start()
+
+    def record(self, job: Job, result: Dict[str, Any]) -> None:
+        """记录任务的一个结果；该 API 不再占用后可能让排队的任务开始执行"""
+        with self._lock:
+            job.record(result)
+            if self._queue:
+                self._start_ready()
+
+    def _run(self, job: Job) -> None:
+        status = DONE
+        try:
+            self.runner(job)
+        except Exception as e:
+            status = FAILED
+            job.error = str(e)
+        finally:
+            with self._lock:
+                job.status = status
+                job.finished_at = time.time()
+                self._running.remove(job)
+                self._trim()
+                self._start_ready()
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._running or self._queue)
+
+    def in_flight(self, api_name: str) -> bool:
+        """该 API 是否在运行中的任务里且尚未得到结果"""
+        with self._lock:
+            return any(job.conflicts([api_name]) for job in self._running)
+
+    def pending(self, api_name: str) -> bool:
+        """该 API 是否在运行中或排队中的任务里"""
+        with self._lock:
+            return any(job.conflicts([api_name]) for job in self._running + self._queue)
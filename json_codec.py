@@ -0,0 +1,126 @@
+import json
+import math
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+
+# 各后端的解码异常（orjson.JSONDecodeError、msgspec.DecodeError、json.JSONDecodeError）都是 ValueError 的子类
+DecodeError = ValueError
+
+
+def _finite(obj: Any) -> Any:
+    """把 NaN/Infinity 替换为 None，与 orjson/msgspec 输出 null 一致"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _json_codec() -> Tuple[Callable, Callable]:
+    # 与 orjson/msgspec 的输出保持一致：紧凑分隔符、非 ASCII 字符直接输出为 UTF-8；
+    # allow_nan=False 避免输出非法的 NaN/Infinity，遇到时替换为 null 后重新编码
+    options = {'ensure_ascii': False, 'separators': (',', ':'), 'allow_nan': False}
+    encoder = json.JSONEncoder(**options)
+
+    def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+        try:
+            if default is not None:
+                return json.dumps(obj, default=default, **options).encode('utf-8')
+            return encoder.encode(obj).encode('utf-8')
+        except ValueError as e:
+            if 'Out of range float values' not in str(e):
+                raise
+            return dumps(_finite(obj), default)
+
+    return dumps, json.loads
+
+
+def _orjson_codec() -> Tuple[Callable, Callable]:
+    import orjson
+
+    # 日期与 dataclass 交给 default 处理；非字符串的键与标准库一样转换为字符串
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+        return orjson.dumps(obj, default=default, option=option)
+
+    return dumps, orjson.loads
+
+
+def _msgspec_codec() -> Tuple[Callable, Callable]:
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+        if default is not None:
+            return msgspec.json.encode(obj, enc_hook=default)
+        return encoder.encode(obj)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return decoder.decode(data)
+
+    return dumps, loads
+
+
+# 按优先级排列，未安装的后端自动跳过
+BACKENDS: Dict[str, Callable[[], Tuple[Callable, Callable]]] = {
+    'orjson': _orjson_codec,
+    'msgspec': _msgspec_codec,
+    'json': _json_codec
+}
+
+backend = None
+_dumps = None
+_loads = None
+
+
+def available_backends() -> list:
+    names = []
+    for name, factory in BACKENDS.items():
+        try:
+            factory()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name: Optional[str] = None) -> str:
+    """切换编解码后端；name 为空时选择已安装的最快后端，返回实际使用的后端名称"""
+    global backend, _dumps, _loads
+
+    candidates = [name] if name else list(BACKENDS)
+    for candidate in candidates:
+        factory = BACKENDS.get(candidate)
+        if factory is None:
+            raise ValueError(f"Unknown JSON backend: {candidate}")
+        try:
+            _dumps, _loads = factory()
+        except ImportError:
+            if name:
+                raise
+            continue
+        backend = candidate
+        return backend
+    raise RuntimeError("No JSON backend available")
+
+
+def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    """编码为 UTF-8 bytes，可直接作为请求体或写入二进制流"""
+    return _dumps(obj, default)
+
+
+def dumps_str(obj: Any, default: Optional[Callable] = None) -> str:
+    return _dumps(obj, default).decode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """解码 bytes 或 str；传入 bytes 时不会先解码为 str"""
+    return _loads(data)
+
+
+set_backend()
@@ -0,0 +1,196 @@
+import atexit
+import hashlib
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    endpoint TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    owner TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+def default_owner() -> str:
+    # 使用稳定的主机名：每次 cron/命令行运行都以同一身份加入，不会留下已退出进程的成员记录
+    return socket.gethostname()
+
+
+def _rank(owner: str, endpoint: str) -> int:
+    return int.from_bytes(hashlib.sha256(f"{owner}|{endpoint}".encode('utf-8')).digest()[:8], 'big')
+
+
+class LeaseStore:
+    """基于 SQLite 的端点租约表：每个端点在租约期内只由一个 owner 请求，租约过期后由其他 owner 接管；
+    成员表按心跳判断存活，进程退出时删除自己的成员记录"""
+    
+    def __init__(self, path, owner: Optional[str] = None, grace: float = 60, member_ttl: Optional[float] = None,
+                 heartbeat_interval: float = 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = owner or default_owner()
+        self.grace = grace
+        self.member_ttl = member_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+    
+    def heartbeat(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO members (owner, last_seen) VALUES (?, ?) '
+                'ON CONFLICT(owner) DO UPDATE SET last_seen = excluded.last_seen',
+                (self.owner, time.time())
+            )
+        finally:
+            conn.close()
+    
+    def start_heartbeat(self) -> None:
+        """在后台定期刷新成员记录，长期运行的进程在两次保活之间也被视为存活"""
+        if self._thread is not None or not self.heartbeat_interval:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name='lease-heartbeat', daemon=True)
+        self._thread.start()
+    
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except sqlite3.Error:
+                # 租约库暂时不可用时等待下一次心跳，成员记录过期前恢复即可
+                continue
+    
+    def leave(self) -> None:
+        """停止心跳并删除成员记录，其他副本立即按剩余成员重新分配首选端点"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            conn = self._connect()
+            try:
+                conn.execute('DELETE FROM members WHERE owner = ?', (self.owner,))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def effective_member_ttl(self) -> float:
+        if self.member_ttl:
+            return self.member_ttl
+        return max(self.heartbeat_interval or 0, 1) * 3
+    
+    def live_members(self, member_ttl: float) -> List[str]:
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT owner FROM members WHERE last_seen >= ?',
+                                (time.time() - member_ttl,)).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+    
+    def acquire_many(self, endpoints: Dict[str, float]) -> List[str]:
+        """尝试获取一组端点的租约（端点 -> 租约秒数），返回本 owner 本次应请求的端点"""
+        if not endpoints:
+            return []
+        
+        with self._lock:
+            self.heartbeat()
+            members = self.live_members(self.effective_member_ttl()) or [self.owner]
+            
+            acquired = []
+            conn = self._connect()
+            try:
+                # IMMEDIATE 事务在读取前加写锁，多个进程同时检查同一租约时只有一个能获取
+                conn.execute('BEGIN IMMEDIATE')
+                now = time.time()
+                for endpoint, ttl in endpoints.items():
+                    preferred = max(members, key=lambda member: _rank(member, endpoint)) == self.owner
+                    row = conn.execute('SELECT owner, expires_at FROM leases WHERE endpoint = ?',
+                                       (endpoint,)).fetchone()
+                    if not self._can_take(row, preferred, now):
+                        continue
+                    conn.execute(
+                        'INSERT INTO leases (endpoint, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(endpoint) DO UPDATE SET owner = excluded.owner, '
+                        'acquired_at = excluded.acquired_at, expires_at = excluded.expires_at',
+                        (endpoint, self.owner, now, now + ttl)
+                    )
+                    acquired.append(endpoint)
+                conn.execute('COMMIT')
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+            return acquired
+    
+    def _can_take(self, row, preferred: bool, now: float) -> bool:
+        if row is None:
+            # 新端点由最先检查到的 owner 获取，之后按首选 owner 重新分配
+            return True
+        owner, expires_at = row
+        if not preferred:
+            # 非首选 owner 只在租约过期超过 grace 秒后接管（首选 owner 失联）
+            return now >= expires_at + self.grace
+        if owner == self.owner:
+            # 自己持有的租约可提前 grace 秒续期，避免调度抖动导致跳过一个周期
+            return now >= expires_at - self.grace
+        return now >= expires_at
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT endpoint, owner, acquired_at, expires_at FROM leases '
+                                'ORDER BY endpoint').fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(('endpoint', 'owner', 'acquired_at', 'expires_at'), row)) for row in rows]
+
+
+_stores: Dict[str, LeaseStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_lease_store(config: Dict[str, Any]) -> Optional[LeaseStore]:
+    if not config.get('enabled', False):
+        return None
+    
+    path = config.get('lease_path', './logs/leases.db')
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = LeaseStore(path, owner=config.get('owner'),
+                               heartbeat_interval=config.get('heartbeat_interval', 30))
+            store.start_heartbeat()
+            atexit.register(store.leave)
+            _stores[key] = store
+        store.grace = config.get('grace', 60)
+        store.member_ttl = config.get('member_ttl')
+        return store
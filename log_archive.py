@@ -0,0 +1,397 @@
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import json_codec
+
+
+DEFAULT_BLOCK_LINES = 1000
+DEFAULT_BLOCK_BYTES = 262144
+
+TEXT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+API_NAME_PATTERN = re.compile(r'API: (.+?) \|')
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compression requires the 'zstandard' package")
+    return zstandard
+
+
+def resolve_compression(compression: str) -> str:
+    """校验压缩算法；配置为 zstd 但未安装 zstandard 时回退为 gzip 并记录警告"""
+    if compression not in ('gzip', 'zstd'):
+        raise ValueError(f"Unknown log archive compression: {compression} (expected gzip or zstd)")
+    if compression == 'zstd':
+        try:
+            _zstd()
+        except RuntimeError as e:
+            logging.getLogger('newapi_keeper').warning(f"{str(e)}, falling back to gzip for log archives")
+            return 'gzip'
+    return compression
+
+
+def compress_block(data: bytes, compression: str) -> bytes:
+    if compression == 'zstd':
+        return _zstd().ZstdCompressor().compress(data)
+    return gzip.compress(data, mtime=0)
+
+
+def decompress_block(data: bytes, compression: str) -> bytes:
+    if compression == 'zstd':
+        return _zstd().ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def extract_jsonl(line: str) -> Tuple[Optional[float], Optional[str]]:
+    try:
+        entry = json_codec.loads(line)
+        return datetime.fromisoformat(entry['timestamp']).timestamp(), entry.get('api_name')
+    except (ValueError, KeyError, TypeError):
+        return None, None
+
+
+def extract_text(line: str) -> Tuple[Optional[float], Optional[str]]:
+    """主日志行以 asctime 开头；多行异常堆栈的后续行没有时间戳"""
+    try:
+        timestamp = datetime.strptime(line[:23], TEXT_TIME_FORMAT + ',%f').timestamp()
+    except ValueError:
+        try:
+            timestamp = datetime.strptime(line[:19], TEXT_TIME_FORMAT).timestamp()
+        except ValueError:
+            return None, None
+    match = API_NAME_PATTERN.search(line)
+    return timestamp, match.group(1) if match else None
+
+
+class LogArchive:
+    """把日志按大小或时间轮转为压缩分段，每个分段由独立压缩的块组成，并附带记录时间范围与 API 名称的索引"""
+    
+    def __init__(self, directory, prefix: str, kind: str = 'jsonl', compression: str = 'gzip',
+                 max_bytes: int = 10485760, interval: float = 0, max_segments: int = 50,
+                 block_lines: int = DEFAULT_BLOCK_LINES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.extract = extract_jsonl if kind == 'jsonl' else extract_text
+        self.set_compression(compression)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.max_segments = max_segments
+        self.block_lines = block_lines
+        self.opened_at = time.time()
+        self._lock = threading.Lock()
+        self._index_cache: Dict[str, Dict[str, Any]] = {}
+    
+    def set_compression(self, compression: str) -> None:
+        self.compression = resolve_compression(compression)
+        self.extension = '.zst' if self.compression == 'zstd' else '.gz'
+    
+    def should_rotate(self, size: int) -> bool:
+        if size <= 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.interval) and time.time() - self.opened_at >= self.interval
+    
+    def pending_path(self, path: Path) -> Path:
+        return path.with_name(path.name + '.archiving')
+    
+    def archive(self, path) -> Optional[str]:
+        """把已关闭写入的日志文件压缩为新分段并删除原文件，返回分段 ID"""
+        path = Path(path)
+        with self._lock:
+            self.opened_at = time.time()
+            pending = self.pending_path(path)
+            if not pending.exists():
+                if not path.exists() or path.stat().st_size == 0:
+                    return None
+                os.replace(path, pending)
+            
+            segment_id = self._new_segment_id()
+            try:
+                index = self._compress(pending, self.segment_path(segment_id))
+                self._write_index(segment_id, index)
+            except BaseException:
+                # 没有索引的分段不会被读取，删除后由下次归档重新生成
+                self._discard(self.segment_path(segment_id))
+                raise
+            pending.unlink()
+            self._prune()
+            return segment_id
+    
+    def restore(self, path) -> bool:
+        """归档失败后把 .archiving 文件移回原位，继续追加写入；原位置已有新文件时保留 .archiving 等待重试"""
+        path = Path(path)
+        pending = self.pending_path(path)
+        with self._lock:
+            if not pending.exists() or path.exists():
+                return False
+            os.replace(pending, path)
+            return True
+    
+    @staticmethod
+    def _discard(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def recover(self, path) -> None:
+        # 上次进程在压缩过程中退出时，残留的 .archiving 文件在启动时补做归档
+        if self.pending_path(Path(path)).exists():
+            self.archive(path)
+    
+    def _new_segment_id(self) -> str:
+        now = time.time()
+        base = time.strftime('%Y%m%dT%H%M%S', time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+        segment_id = base
+        counter = 1
+        while self.index_path(segment_id).exists() or self.segment_path(segment_id).exists():
+            segment_id = f"{base}{counter:02d}"
+            counter += 1
+        return segment_id
+    
+    def segment_path(self, segment_id: str) -> Path:
+        return self.directory / f"{self.prefix}-{segment_id}{self.extension}"
+    
+    def index_path(self, segment_id: str) -> Path:
+        return self.directory / f"{self.prefix}-{segment_id}.idx.json"
+    
+    def _compress(self, source: Path, target: Path) -> Dict[str, Any]:
+        blocks = []
+        offset = 0
+        tmp_target = target.with_name(target.name + '.tmp')
+        
+        try:
+            with open(source, 'rb') as src, open(tmp_target, 'wb') as dst:
+                lines: List[bytes] = []
+                size = 0
+                for raw in src:
+                    lines.append(raw)
+                    size += len(raw)
+                    if len(lines) >= self.block_lines or size >= DEFAULT_BLOCK_BYTES:
+                        offset = self._write_block(dst, lines, offset, blocks)
+                        lines, size = [], 0
+                if lines:
+                    self._write_block(dst, lines, offset, blocks)
+            os.replace(tmp_target, target)
+        except BaseException:
+            self._discard(tmp_target)
+            raise
+        
+        times = [t for block in blocks for t in (block['start_time'], block['end_time']) if t is not None]
+        return {
+            'file': target.name,
+            'compression': self.compression,
+            'lines': sum(block['lines'] for block in blocks),
+            'start_time': min(times) if times else None,
+            'end_time': max(times) if times else None,
+            'api_names': sorted({name for block in blocks for name in block['api_names']}),
+            'blocks': blocks
+        }
+    
+    def _write_block(self, dst, lines: List[bytes], offset: int, blocks: List[Dict[str, Any]]) -> int:
+        times = []
+        api_names = set()
+        for raw in lines:
+            timestamp, api_name = self.extract(raw.decode('utf-8', errors='replace'))
+            if timestamp is not None:
+                times.append(timestamp)
+            if api_name:
+                api_names.add(api_name)
+        
+        data = compress_block(b''.join(lines), self.compression)
+        dst.write(data)
+        blocks.append({
+            'offset': offset,
+            'length': len(data),
+            'first_line': sum(block['lines'] for block in blocks),
+            'lines': len(lines),
+            'start_time': min(times) if times else None,
+            'end_time': max(times) if times else None,
+            'api_names': sorted(api_names)
+        })
+        return offset + len(data)
+    
+    def _write_index(self, segment_id: str, index: Dict[str, Any]) -> None:
+        path = self.index_path(segment_id)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def _prune(self) -> None:
+        if not self.max_segments:
+            return
+        for segment_id in self.segment_ids()[self.max_segments:]:
+            try:
+                paths = [self.directory / self.load_index(segment_id)['file'], self.index_path(segment_id)]
+            except (OSError, ValueError, KeyError):
+                paths = [self.index_path(segment_id)]
+            for path in paths:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            self._index_cache.pop(segment_id, None)
+    
+    def segment_ids(self) -> List[str]:
+        """返回已完成归档的分段 ID，新的在前"""
+        prefix = f"{self.prefix}-"
+        ids = [path.name[len(prefix):-len('.idx.json')]
+               for path in self.directory.glob(f"{prefix}*.idx.json")]
+        return sorted(ids, reverse=True)
+    
+    def load_index(self, segment_id: str) -> Dict[str, Any]:
+        # 分段写入后不再修改，索引可以一直缓存
+        index = self._index_cache.get(segment_id)
+        if index is None:
+            with open(self.index_path(segment_id), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self._index_cache[segment_id] = index
+        return index
+    
+    def read_block(self, segment_id: str, block: Dict[str, Any]) -> List[str]:
+        index = self.load_index(segment_id)
+        with open(self.directory / index['file'], 'rb') as f:
+            f.seek(block['offset'])
+            data = decompress_block(f.read(block['length']), index['compression'])
+        # 按 b'\n' 切分后再逐行解码，与索引的行数一致；str.splitlines 还会在 U+2028 等字符处切分
+        if data.endswith(b'\n'):
+            data = data[:-1]
+        if not data:
+            return []
+        return [part.decode('utf-8', errors='replace').rstrip('\r') for part in data.split(b'\n')]
+    
+    def read_lines_before(self, segment_id: str, end: Optional[int], limit: int) -> Tuple[List[str], int]:
+        """读取分段中第 end 行之前的最多 limit 行，只解压覆盖这些行的块，返回 (行列表, 首行序号)"""
+        index = self.load_index(segment_id)
+        end = index['lines'] if end is None else min(end, index['lines'])
+        start = max(0, end - limit)
+        
+        lines: List[str] = []
+        for block in index['blocks']:
+            block_end = block['first_line'] + block['lines']
+            if block_end <= start or block['first_line'] >= end:
+                continue
+            block_lines = self.read_block(segment_id, block)
+            lo = max(start, block['first_line']) - block['first_line']
+            hi = min(end, block_end) - block['first_line']
+            lines.extend(block_lines[lo:hi])
+        return lines, start
+    
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              api_name: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+        """按时间范围和 API 名称查询归档日志（新的在前），跳过索引表明不相关的分段与块"""
+        matched: List[str] = []
+        scanned = 0
+        blocks_read = 0
+        
+        for segment_id in self.segment_ids():
+            index = self.load_index(segment_id)
+            if not self._overlaps(index, since, until, api_name):
+                continue
+            scanned += 1
+            
+            for block in reversed(index['blocks']):
+                if not self._overlaps(block, since, until, api_name):
+                    continue
+                blocks_read += 1
+                for line in reversed(self.read_block(segment_id, block)):
+                    if self._line_matches(line, since, until, api_name):
+                        matched.append(line)
+                        if len(matched) >= limit:
+                            return {'lines': matched, 'segments_scanned': scanned, 'blocks_read': blocks_read}
+        
+        return {'lines': matched, 'segments_scanned': scanned, 'blocks_read': blocks_read}
+    
+    @staticmethod
+    def _overlaps(entry: Dict[str, Any], since: Optional[float], until: Optional[float],
+                  api_name: Optional[str]) -> bool:
+        if api_name is not None and api_name not in entry['api_names']:
+            return False
+        if since is not None and entry['end_time'] is not None and entry['end_time'] < since:
+            return False
+        if until is not None and entry['start_time'] is not None and entry['start_time'] > until:
+            return False
+        return True
+    
+    def _line_matches(self, line: str, since: Optional[float], until: Optional[float],
+                      api_name: Optional[str]) -> bool:
+        if since is None and until is None and api_name is None:
+            return True
+        timestamp, line_api = self.extract(line)
+        if api_name is not None and line_api != api_name:
+            return False
+        if timestamp is None:
+            return since is None and until is None
+        if since is not None and timestamp < since:
+            return False
+        return until is None or timestamp <= until
+
+
+class ArchivingFileHandler(logging.FileHandler):
+    """文件写满或到达轮转间隔时归档为压缩分段，替代 RotatingFileHandler 的明文 .N 备份"""
+    
+    def __init__(self, filename, archive: LogArchive, encoding: str = 'utf-8'):
+        archive.recover(filename)
+        super().__init__(filename, encoding=encoding)
+        self.archive = archive
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is not None and self.archive.should_rotate(self.stream.tell()):
+                self.doRollover()
+        except Exception:
+            self.handleError(record)
+        super().emit(record)
+    
+    def doRollover(self) -> None:
+        # 关闭后由 FileHandler.emit 在下一条记录时重新打开新文件
+        self.stream.close()
+        self.stream = None
+        try:
+            self.archive.archive(self.baseFilename)
+        except Exception:
+            self.archive.restore(self.baseFilename)
+            raise
+
+
+LOG_KINDS = {
+    'newapi_keeper': 'text',
+    'request_details': 'jsonl'
+}
+
+_archives: Dict[str, LogArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_log_archive(logging_config: Dict[str, Any], name: str) -> Optional[LogArchive]:
+    """按日志名称返回共享的归档实例；未开启归档时返回 None"""
+    archive_config = logging_config.get('archive', {})
+    if not archive_config.get('enabled', False):
+        return None
+    
+    directory = Path(archive_config.get('path', Path(logging_config.get('path', './logs')) / 'archive'))
+    key = f"{directory.resolve()}:{name}"
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None:
+            archive = LogArchive(directory, name, kind=LOG_KINDS.get(name, 'text'))
+            _archives[key] = archive
+        archive.set_compression(archive_config.get('compression', 'gzip'))
+        archive.max_bytes = archive_config.get('max_bytes', logging_config.get('max_file_size', 10485760))
+        archive.interval = archive_config.get('interval', 0)
+        archive.max_segments = archive_config.get('max_segments', 50)
+        archive.block_lines = archive_config.get('block_lines', DEFAULT_BLOCK_LINES)
+        return archive
@@ -1,13 +1,51 @@
-import queue
 import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+
+class LogBroadcaster:
+    """基于环形缓冲区的日志广播：每条事件带递增 ID，订阅者各自持有游标，互不影响"""
+    
+    def __init__(self, capacity: int = 1000):
+        self._events = deque(maxlen=capacity)
+        self._last_id = 0
+        self._cond = threading.Condition()
+    
+    @property
+    def last_id(self) -> int:
+        with self._cond:
+            return self._last_id
+    
+    def publish(self, message: str, log_type: str = 'info') -> int:
+        with self._cond:
+            self._last_id += 1
+            self._events.append({
+                'id': self._last_id,
+                'type': log_type,
+                'message': message
+            })
+            self._cond.notify_all()
+            return self._last_id
+    
+    def _events_after(self, cursor: int) -> List[Dict[str, Any]]:
+        if not self._events or self._events[-1]['id'] <= cursor:
+            return []
+        # 缓冲区中的 ID 连续，可直接按下标定位游标之后的第一条事件
+        start = max(0, cursor - self._events[0]['id'] + 1)
+        return [self._events[i] for i in range(start, len(self._events))]
+    
+    def wait_for_events(self, cursor: int, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """返回 ID 大于 cursor 的事件；暂无新事件时最多等待 timeout 秒"""
+        with self._cond:
+            events = self._events_after(cursor)
+            if not events:
+                self._cond.wait(timeout)
+                events = self._events_after(cursor)
+            return events
+
+
+broadcaster = LogBroadcaster()
 
-log_queue = queue.Queue(maxsize=1000)
 
 def broadcast_log(message: str, log_type: str = 'info'):
-    try:
-        log_queue.put_nowait({
-            'type': log_type,
-            'message': message
-        })
-    except queue.Full:
-        pass
+    broadcaster.publish(message, log_type)
@@ -0,0 +1,138 @@
+import os
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+
+BLOCK_SIZE = 65536
+
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[int, Optional[int]]:
+    """游标格式为 '<分段序号>:<字节偏移>'，0 表示当前日志文件，N 表示 .N 轮转文件"""
+    if not cursor:
+        return 0, None
+    
+    if ':' in cursor:
+        segment, offset = cursor.split(':', 1)
+        return int(segment), int(offset)
+    return 0, int(cursor)
+
+
+def segment_path(path: Path, segment: int) -> Path:
+    if segment == 0:
+        return path
+    return path.with_name(f"{path.name}.{segment}")
+
+
+def read_lines_backwards(path: Path, end: Optional[int], limit: int,
+                         block_size: int = BLOCK_SIZE) -> Tuple[List[str], int]:
+    """从 end 偏移处向前读取最多 limit 行，只读取所需的块，返回 (行列表, 首行起始偏移)"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size if end is None else min(end, size)
+        if end <= 0 or limit <= 0:
+            return [], max(end, 0)
+        
+        pos = end
+        buffer = b''
+        while pos > 0 and buffer.count(b'\n') <= limit:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            buffer = f.read(read_size) + buffer
+    
+    trailing = 1 if buffer.endswith(b'\n') else 0
+    parts = buffer[:len(buffer) - trailing].split(b'\n')
+    taken = parts[-limit:]
+    
+    if pos == 0 and len(taken) == len(parts):
+        start = 0
+    else:
+        start = end - trailing - len(b'\n'.join(taken))
+    
+    lines = [part.decode('utf-8', errors='replace').rstrip('\r') for part in taken]
+    return lines, start
+
+
+def tail_lines(path, limit: int, before: Optional[str] = None, archive=None) -> Dict[str, Any]:
+    """读取日志末尾（或游标之前）的 limit 行，必要时继续读取更早的轮转分段"""
+    if archive is not None:
+        return tail_archived_lines(path, limit, before, archive)
+    
+    path = Path(path)
+    segment, offset = parse_cursor(before)
+    collected: List[str] = []
+    remaining = limit
+    cursor = None
+    
+    while remaining > 0:
+        cursor = None
+        current = segment_path(path, segment)
+        if not current.exists():
+            break
+        
+        lines, start = read_lines_backwards(current, offset, remaining)
+        collected = lines + collected
+        remaining -= len(lines)
+        
+        if start > 0:
+            cursor = f"{segment}:{start}"
+            break
+        
+        segment += 1
+        offset = None
+        older = segment_path(path, segment)
+        if older.exists():
+            cursor = f"{segment}:{older.stat().st_size}"
+    
+    return {
+        'lines': collected,
+        'cursor': cursor
+    }
+
+
+def tail_archived_lines(path, limit: int, before: Optional[str], archive) -> Dict[str, Any]:
+    """当前文件读完后继续读取压缩归档分段；归档分段的游标为 '<分段ID>:<行号>'，只解压需要的块"""
+    path = Path(path)
+    segment, offset = '0', None
+    if before:
+        segment, _, offset_text = before.partition(':')
+        offset = int(offset_text)
+    
+    segment_ids = archive.segment_ids()
+    if segment != '0' and segment not in segment_ids:
+        raise ValueError(f"Unknown archive segment: {segment}")
+    
+    collected: List[str] = []
+    remaining = limit
+    cursor = None
+    
+    if segment == '0':
+        if path.exists():
+            lines, start = read_lines_backwards(path, offset, remaining)
+            collected = lines
+            remaining -= len(lines)
+            if start > 0:
+                return {'lines': collected, 'cursor': f"0:{start}"}
+        # 游标中的偏移是当前文件的字节偏移，归档分段从末尾开始读取
+        offset = None
+        older = segment_ids
+    else:
+        older = segment_ids[segment_ids.index(segment):]
+    
+    for segment_id in older:
+        if remaining <= 0:
+            # 已取满，游标指向下一个更早分段的末尾
+            cursor = f"{segment_id}:{archive.load_index(segment_id)['lines']}"
+            break
+        lines, start = archive.read_lines_before(segment_id, offset, remaining)
+        offset = None
+        collected = lines + collected
+        remaining -= len(lines)
+        if start > 0:
+            cursor = f"{segment_id}:{start}"
+            break
+    
+    return {
+        'lines': collected,
+        'cursor': cursor
+    }
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+# 归档失败后至少间隔该秒数再重试，避免磁盘已满等持续性错误时每一批都重试
+ROTATE_RETRY_INTERVAL = 60
+
+class AsyncJSONLWriter:
+    """后台线程批量写入 JSONL：按条数或时间间隔刷新，文件句柄保持打开"""
+    
+    _STOP = object()
+    
+    def __init__(self, path, batch_size: int = 100, flush_interval: float = 1.0,
+                 queue_size: int = 10000, put_timeout: float = 0.5, archive=None):
+        self.path = Path(path)
+        self.archive = archive
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._delayed = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='jsonl-writer', daemon=True)
+        self._thread.start()
+    
+    def write(self, line: str) -> bool:
+        """提交一行记录；队列已满时最多等待 put_timeout 秒，仍无空间则丢弃"""
+        if self._closed:
+            return False
+        
+        try:
+            self._queue.put_nowait(line)
+            return True
+        except queue.Full:
+            pass
+        
+        try:
+            self._queue.put(line, timeout=self.put_timeout)
+            with self._stats_lock:
+                self._delayed += 1
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            return False
+    
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.archive is not None:
+            try:
+                self.archive.recover(self.path)
+            except Exception as e:
+                self._report_archive_error(e)
+        f = open(self.path, 'a', encoding='utf-8')
+        retry_at = 0.0
+        try:
+            while True:
+                batch: List[str] = []
+                stop = False
+                deadline = time.monotonic() + self.flush_interval
+                
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                
+                if batch:
+                    f.write(''.join(line + '\n' for line in batch))
+                    f.flush()
+                    with self._stats_lock:
+                        self._written += len(batch)
+                
+                if stop:
+                    return
+                
+                if (self.archive is not None and time.monotonic() >= retry_at
+                        and self.archive.should_rotate(f.tell())):
+                    # 在写线程内轮转，关闭文件后归档，再打开新的空文件
+                    f.close()
+                    try:
+                        self.archive.archive(self.path)
+                    except Exception as e:
+                        # 归档失败时把文件移回原位继续写入，稍后重试；写线程不能因此退出
+                        retry_at = time.monotonic() + ROTATE_RETRY_INTERVAL
+                        self._report_archive_error(e)
+                    f = open(self.path, 'a', encoding='utf-8')
+        finally:
+            f.close()
+    
+    def _report_archive_error(self, error: Exception) -> None:
+        try:
+            restored = self.archive.restore(self.path)
+        except OSError:
+            restored = False
+        suffix = '' if restored else f", pending data kept in {self.archive.pending_path(self.path).name}"
+        logging.getLogger('newapi_keeper').error(f"Failed to archive {self.path.name}: {str(error)}{suffix}")
+    
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """停止接收新记录，写完队列中剩余的记录后退出"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'written': self._written,
+                'dropped': self._dropped,
+                'delayed': self._delayed,
+                'queued': self._queue.qsize()
+            }
+
+
+_writers: Dict[str, AsyncJSONLWriter] = {}
+_listeners: Dict[str, QueueListener] = {}
+_direct_handlers: Dict[str, List[logging.Handler]] = {}
+_registry_lock = threading.Lock()
+
+
+def get_jsonl_writer(path, config: Dict[str, Any], archive=None) -> AsyncJSONLWriter:
+    key = str(Path(path).resolve())
+    with _registry_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = AsyncJSONLWriter(
+                path,
+                batch_size=config.get('batch_size', 100),
+                flush_interval=config.get('flush_interval', 1.0),
+                queue_size=config.get('queue_size', 10000),
+                put_timeout=config.get('put_timeout', 0.5),
+                archive=archive
+            )
+            _writers[key] = writer
+        else:
+            writer.archive = archive
+        return writer
+
+
+def install_handlers(logger: logging.Logger, handlers: List[logging.Handler], use_queue: bool = True) -> None:
+    """替换此前安装在 logger 上的 handlers，重复调用不会叠加输出或泄漏文件句柄；
+    use_queue 为 True 时 handlers 由后台线程执行，logger 上只保留一个 QueueHandler"""
+    with _registry_lock:
+        old_listener = _listeners.pop(logger.name, None)
+        if old_listener is not None:
+            old_listener.stop()
+            for handler in old_listener.handlers:
+                handler.close()
+        
+        for handler in _direct_handlers.pop(logger.name, []):
+            logger.removeHandler(handler)
+            handler.close()
+        
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                logger.removeHandler(handler)
+        
+        if not use_queue:
+            for handler in handlers:
+                logger.addHandler(handler)
+            _direct_handlers[logger.name] = list(handlers)
+            return
+        
+        log_queue = queue.Queue(-1)
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        logger.addHandler(QueueHandler(log_queue))
+        _listeners[logger.name] = listener
+
+
+def shutdown() -> None:
+    with _registry_lock:
+        listeners = list(_listeners.values())
+        _listeners.clear()
+        writers = list(_writers.values())
+        _writers.clear()
+    
+    for listener in listeners:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(shutdown)
@@ -1,9 +1,15 @@
 import logging
-import json
+import threading
 from pathlib import Path
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from typing import Dict, Any
+from log_writer import get_jsonl_writer, install_handlers
+from history_store import get_history_store
+from log_archive import ArchivingFileHandler, get_log_archive
+import json_codec
+import metrics
+import stats
 
 try:
     from log_broadcaster import broadcast_log
@@ -27,50 +33,107 @@ class APILogger:
         max_bytes = config.get('max_file_size', 10485760)
         backup_count = config.get('backup_count', 5)
         
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=max_bytes,
-            backupCount=backup_count,
-            encoding='utf-8'
-        )
+        main_archive = get_log_archive(config, 'newapi_keeper')
+        if main_archive is not None:
+            file_handler = ArchivingFileHandler(log_file, main_archive, encoding='utf-8')
+        else:
+            file_handler = RotatingFileHandler(
+                log_file,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding='utf-8'
+            )
         file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
         
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        
+        async_config = config.get('async', {})
+        self.async_enabled = async_config.get('enabled', True)
+        self.detail_writer = None
+        self.detail_archive = get_log_archive(config, 'request_details')
+        self._detail_lock = threading.Lock()
+        if self.detail_archive is not None and not self.async_enabled:
+            self.detail_archive.recover(self.log_path / 'request_details.jsonl')
+        
+        install_handlers(self.logger, [file_handler, console_handler], use_queue=self.async_enabled)
+        if self.async_enabled:
+            self.detail_writer = get_jsonl_writer(self.log_path / 'request_details.jsonl', async_config,
+                                                  self.detail_archive)
+        
+        self.history_store = get_history_store(config.get('history_store', {}))
     
     def log_request(self, strategy_type: str, result: Dict[str, Any]):
         timestamp = datetime.now().isoformat()
         api_name = result.get('api_name', 'Unknown')
         
+        metrics.record_request(result)
+        changes = stats.record_result(result)
+        if changes:
+            # 只推送该 API 变化的计数，仪表盘按字段合并
+            broadcast_log(json_codec.dumps_str({'api_name': api_name, 'changes': changes}), 'stats')
+        if self.history_store is not None:
+            self.history_store.record(strategy_type, result)
+        
         if result.get('success'):
             msg = (f"API: {api_name} | Strategy: {strategy_type} | "
                    f"Tokens: {result['usage']['total_tokens']} | "
                    f"Model: {result['model']}")
+            if result.get('ttft') is not None:
+                msg += f" | TTFT: {result['ttft']:.3f}s"
+            if result.get('probe_tier', 'completion') != 'completion':
+                msg += f" | Probe: {result['probe_tier']}"
             self.logger.info(msg)
             broadcast_log(msg, 'info')
             
-            detail_log = self.log_path / 'request_details.jsonl'
-            with open(detail_log, 'a', encoding='utf-8') as f:
-                log_entry = {
-                    'timestamp': timestamp,
-                    'api_name': api_name,
-                    'strategy': strategy_type,
-                    'prompt': result['prompt'],
-                    'response': result['response'],
-                    'usage': result['usage'],
-                    'model': result['model']
-                }
-                json_str = json.dumps(log_entry, ensure_ascii=False)
-                f.write(json_str + '\n')
-                broadcast_log(json_str, 'detail')
+            log_entry = {
+                'timestamp': timestamp,
+                'api_name': api_name,
+                'strategy': strategy_type,
+                'prompt': result['prompt'],
+                'response': result['response'],
+                'usage': result['usage'],
+                'model': result['model']
+            }
+            if 'probe_tier' in result:
+                log_entry['probe_tier'] = result['probe_tier']
+            if 'ttfb' in result:
+                log_entry['ttfb'] = result['ttfb']
+                log_entry['ttft'] = result.get('ttft')
+                log_entry['aborted_early'] = result.get('aborted_early', False)
+            if 'timings' in result:
+                log_entry['timings'] = result['timings']
+                log_entry['body_bytes'] = result.get('body_bytes', 0)
+            json_str = json_codec.dumps_str(log_entry)
+            self._write_detail(json_str)
+            broadcast_log(json_str, 'detail')
         else:
             msg = (f"API: {api_name} | Strategy: {strategy_type} | "
                    f"Error: {result.get('error', 'Unknown error')}")
+            if result.get('probe_tier', 'completion') != 'completion':
+                msg += f" | Probe: {result['probe_tier']}"
             self.logger.error(msg)
             broadcast_log(msg, 'error')
     
+    def _write_detail(self, json_str: str):
+        if self.detail_writer is not None:
+            self.detail_writer.write(json_str)
+            return
+        
+        detail_log = self.log_path / 'request_details.jsonl'
+        # 并发请求同时写入时，避免在归档移动文件期间写入被移走的文件
+        with self._detail_lock:
+            with open(detail_log, 'a', encoding='utf-8') as f:
+                f.write(json_str + '\n')
+                size = f.tell()
+            if self.detail_archive is not None and self.detail_archive.should_rotate(size):
+                self.detail_archive.archive(detail_log)
+    
+    def get_writer_stats(self) -> Dict[str, Any]:
+        if self.detail_writer is None:
+            return {}
+        return self.detail_writer.stats()
+    
     def log_strategy_failure(self, strategy_type: str, error: str):
         msg = f"Strategy {strategy_type} failed: {error}"
         self.logger.warning(msg)
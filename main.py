@@ -1,103 +1,440 @@
 #!/usr/bin/env python3
+import multiprocessing
 import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
-from config_loader import ConfigLoader
-from newapi_client import NewAPIClient
-from logger import APILogger
-from strategies import NewsStrategy, WebpageStrategy, RandomQuestionStrategy
+from urllib.parse import urlparse
+import metrics
+import log_writer
+import history_store
+from deadline import Deadline, get_deadline
+from runtime import KeeperRuntime
+from scheduling import resolve_api_schedule
+from strategies import create_strategy
 
 
-def create_strategy(strategy_config):
-    strategy_type = strategy_config.get('type')
-    
-    if strategy_type == 'news':
-        return NewsStrategy(strategy_config)
-    elif strategy_type == 'webpage':
-        return WebpageStrategy(strategy_config)
-    elif strategy_type == 'random_question':
-        return RandomQuestionStrategy(strategy_config)
-    else:
-        return None
-
-
-def run_keeper_task():
-    config_loader = ConfigLoader('config.yaml')
-    logger = APILogger(config_loader.get_logging_config())
-    
-    logger.log_info("=" * 50)
-    logger.log_info("NewAPI Keeper Started")
-    logger.log_info("=" * 50)
-    
-    apis_config = config_loader.get_apis_config()
-    if not apis_config:
-        logger.log_error("No enabled APIs found in configuration")
-        return
-    
-    logger.log_info(f"Found {len(apis_config)} enabled API(s)")
-    
-    strategies_config = config_loader.get_strategies_config()
-    strategies_config.sort(key=lambda x: x.get('priority', 999))
-    
-    prompt = None
-    used_strategy = None
-    
-    for strategy_config in strategies_config:
+def build_strategies(strategies_config):
+    strategies = []
+    for strategy_config in sorted(strategies_config, key=lambda x: x.get('priority', 999)):
         if not strategy_config.get('enabled', True):
             continue
         
         strategy = create_strategy(strategy_config)
-        if not strategy:
-            continue
-        
-        strategy_type = strategy_config.get('type')
+        if strategy:
+            strategies.append((strategy_config.get('type'), strategy))
+    return strategies
+
+
+def select_strategies(runtime, strategy_type):
+    """只使用指定类型的策略；配置中已禁用的策略也可以被指定"""
+    for configured_type, strategy in runtime.strategies:
+        if configured_type == strategy_type:
+            return [(configured_type, strategy)]
+    
+    for strategy_config in runtime.config_loader.get_strategies_config():
+        if strategy_config.get('type') == strategy_type:
+            strategy = create_strategy(strategy_config)
+            return [(strategy_type, strategy)] if strategy else []
+    return []
+
+
+def timed_generate(strategy_type, strategy):
+    started = time.monotonic()
+    prompt = None
+    try:
+        prompt = strategy.generate_prompt()
+        return prompt
+    finally:
+        metrics.record_strategy(strategy_type, time.monotonic() - started, bool(prompt))
+
+
+def generate_prompt_sequential(strategies, logger):
+    for strategy_type, strategy in strategies:
         logger.log_info(f"Trying strategy: {strategy_type}")
         
         try:
-            prompt = strategy.generate_prompt()
+            prompt = timed_generate(strategy_type, strategy)
             if prompt:
-                used_strategy = strategy_type
                 logger.log_info(f"Strategy {strategy_type} succeeded")
-                break
+                return prompt, strategy_type
             else:
                 logger.log_strategy_failure(strategy_type, "No prompt generated")
         except Exception as e:
             logger.log_strategy_failure(strategy_type, str(e))
     
-    if not prompt:
-        logger.log_error("All strategies failed, no prompt generated")
-        return
+    return None, None
+
+
+def run_in_daemon_thread(fn, *args):
+    future = Future()
     
-    logger.log_info(f"Generated prompt using strategy: {used_strategy}")
-    logger.log_info("=" * 50)
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=runner, daemon=True).start()
+    return future
+
+
+def generate_prompt_race(strategies, logger, race_config):
+    """所有策略并发执行：截止时间内优先级最高的成功者胜出，超时后取最先成功的降级结果"""
+    if not strategies:
+        return None, None
+    
+    deadline = time.monotonic() + float(race_config.get('deadline', 5))
+    logger.log_info(f"Racing strategies: {', '.join(t for t, _ in strategies)}")
+    
+    # 使用守护线程，落选的慢策略不会阻塞进程退出
+    futures = [run_in_daemon_thread(timed_generate, strategy_type, strategy)
+               for strategy_type, strategy in strategies]
+    outcomes = [None] * len(strategies)
+    
+    pending = set(futures)
+    while True:
+        for idx, future in enumerate(futures):
+            if outcomes[idx] is not None or not future.done():
+                continue
+            strategy_type = strategies[idx][0]
+            try:
+                prompt = future.result()
+            except Exception as e:
+                prompt = None
+                logger.log_strategy_failure(strategy_type, str(e))
+            else:
+                if not prompt:
+                    logger.log_strategy_failure(strategy_type, "No prompt generated")
+            outcomes[idx] = prompt or ''
+        
+        # 所有更高优先级策略均已失败时，当前成功者可立即胜出
+        for idx, prompt in enumerate(outcomes):
+            if prompt is None:
+                break
+            if prompt:
+                logger.log_info(f"Strategy {strategies[idx][0]} succeeded")
+                return prompt, strategies[idx][0]
+        
+        if time.monotonic() >= deadline:
+            for idx, prompt in enumerate(outcomes):
+                if prompt:
+                    logger.log_info(f"Strategy {strategies[idx][0]} succeeded after deadline")
+                    return prompt, strategies[idx][0]
+        
+        pending = {future for future in pending if not future.done()}
+        if not pending:
+            return None, None
+        
+        timeout = deadline - time.monotonic()
+        wait(pending, timeout=timeout if timeout > 0 else None, return_when=FIRST_COMPLETED)
+
+
+def strategy_label(used_strategy, result):
+    if used_strategy is None and result.get('error_type') == 'deadline_exceeded':
+        return 'deadline'
+    # 探测请求不使用策略生成的提示词，单独标记
+    if result.get('probe_tier', 'completion') == 'completion':
+        return used_strategy
+    return 'probe'
+
+
+def client_host(client):
+    return urlparse(client.url).netloc.lower()
+
+
+def make_prompt_supplier(strategies, logger, race_config, pool=None, deadline=None, prompt_share=None):
+    """返回为每个请求提供 (prompt, strategy) 的函数：优先从预取池取，未命中时同步生成，每次运行最多生成一次"""
+    lock = threading.Lock()
+    fallback = {}
+    deadline = deadline or Deadline()
+    
+    def generate_unbounded():
+        if race_config.get('enabled', False):
+            return generate_prompt_race(strategies, logger, race_config)
+        return generate_prompt_sequential(strategies, logger)
+    
+    def generate():
+        # 同步生成最多占用 prompt_share 比例的运行预算；策略内部的抓取无法中断，放在守护线程中超时后放弃
+        budget = deadline.phase(prompt_share).remaining()
+        if budget is None:
+            return generate_unbounded()
+        try:
+            return run_in_daemon_thread(generate_unbounded).result(timeout=budget)
+        except FutureTimeoutError:
+            logger.log_error(f"Prompt generation exceeded its {budget:.1f}s deadline budget")
+            return None, None
+    
+    def next_prompt():
+        if pool is not None:
+            item = pool.take()
+            if item is not None:
+                return item
+        
+        with lock:
+            if 'result' not in fallback:
+                fallback['result'] = generate()
+                prompt, used_strategy = fallback['result']
+                if prompt:
+                    logger.log_info(f"Generated prompt using strategy: {used_strategy}")
+                else:
+                    logger.log_error("All strategies failed, no prompt generated")
+            return fallback['result']
+    
+    return next_prompt
+
+
+def keepalive_client(client, next_prompt, deadline):
+    if deadline.exhausted():
+        return client.deadline_result(), None
     
+    prompt, used_strategy = None, None
+    if client.probe_mode == 'completion':
+        prompt, used_strategy = next_prompt()
+        if not prompt:
+            raise RuntimeError("No prompt available")
+    return client.keepalive(prompt, deadline), used_strategy
+
+
+def record_deadline_exceeded(clients, logger, on_result=None):
+    """运行预算耗尽时，为尚未完成的 API 记录 deadline_exceeded 结果"""
+    logger.log_error(f"Run deadline exceeded, {len(clients)} API(s) unfinished")
+    for client in clients:
+        result = client.deadline_result(error="Run deadline exceeded before the request finished")
+        logger.log_request(strategy_label(None, result), result)
+        if on_result:
+            on_result(result)
+    return len(clients)
+
+
+def dispatch_sequential(clients, next_prompt, logger, on_result=None, deadline=None):
+    deadline = deadline or Deadline()
     success_count = 0
     failed_count = 0
     
-    for api_config in apis_config:
-        api_name = api_config.get('name', 'Unknown')
-        logger.log_info(f"Sending request to API: {api_name}")
+    for index, client in enumerate(clients):
+        if deadline.exhausted():
+            failed_count += record_deadline_exceeded(clients[index:], logger, on_result)
+            break
+        
+        logger.log_info(f"Sending request to API: {client.name}")
         
         try:
-            client = NewAPIClient(api_config)
-            result = client.send_request(prompt)
-            logger.log_request(used_strategy, result)
+            result, used_strategy = keepalive_client(client, next_prompt, deadline)
+            logger.log_request(strategy_label(used_strategy, result), result)
+            if on_result:
+                on_result(result)
             
             if result.get('success'):
                 success_count += 1
             else:
                 failed_count += 1
         except Exception as e:
-            logger.log_error(f"Failed to send request to {api_name}: {str(e)}")
+            logger.log_error(f"Failed to send request to {client.name}: {str(e)}")
             failed_count += 1
     
+    return success_count, failed_count
+
+
+def dispatch_concurrent(clients, next_prompt, logger, concurrency_config, on_result=None, deadline=None):
+    deadline = deadline or Deadline()
+    max_workers = max(1, int(concurrency_config.get('max_workers', 10)))
+    per_host = max(1, int(concurrency_config.get('per_host', 4)))
+    
+    host_limits = {}
+    for client in clients:
+        host = client_host(client)
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(per_host)
+    
+    def worker(client):
+        semaphore = host_limits[client_host(client)]
+        # 等待同 host 的名额也受运行预算约束
+        if not semaphore.acquire(timeout=deadline.remaining()):
+            return client.deadline_result(), None
+        try:
+            return keepalive_client(client, next_prompt, deadline)
+        finally:
+            semaphore.release()
+    
+    logger.log_info(
+        f"Dispatching {len(clients)} request(s) concurrently "
+        f"(max_workers={max_workers}, per_host={per_host})"
+    )
+    
+    success_count = 0
+    failed_count = 0
+    handled = set()
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='keeper')
+    try:
+        futures = {
+            executor.submit(worker, client): client
+            for client in _interleave_by_host(clients)
+        }
+        
+        try:
+            for future in as_completed(futures, timeout=deadline.remaining()):
+                handled.add(future)
+                try:
+                    result, used_strategy = future.result()
+                    logger.log_request(strategy_label(used_strategy, result), result)
+                    if on_result:
+                        on_result(result)
+                    
+                    if result.get('success'):
+                        success_count += 1
+                    else:
+                        failed_count += 1
+                except Exception as e:
+                    logger.log_error(f"Failed to send request to {futures[future].name}: {str(e)}")
+                    failed_count += 1
+        except FutureTimeoutError:
+            # 通知仍在执行的请求尽快结束，未开始的任务直接取消
+            deadline.cancel()
+            unfinished = [client for future, client in futures.items() if future not in handled]
+            failed_count += record_deadline_exceeded(unfinished, logger, on_result)
+    finally:
+        # 不等待仍在进行中的请求：它们的超时取自剩余预算，预算耗尽后很快自行结束
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return success_count, failed_count
+
+
+def _interleave_by_host(clients):
+    # 按 host 轮询排列，避免同一 host 的任务占满线程池而在信号量上空等
+    buckets = {}
+    for client in clients:
+        buckets.setdefault(client_host(client), []).append(client)
+    
+    ordered = []
+    queues = list(buckets.values())
+    while queues:
+        for bucket in queues:
+            ordered.append(bucket.pop(0))
+        queues = [bucket for bucket in queues if bucket]
+    return ordered
+
+
+def lease_ttls(config_loader, clients):
+    """租约时长默认等于该 API 的调度间隔，保证每个间隔内只有一个 owner 请求"""
+    sharding_config = config_loader.get_sharding_config()
+    schedule_config = config_loader.get_schedule_config()
+    ttls = {}
+    for client in clients:
+        ttl = sharding_config.get('lease_ttl')
+        if ttl is None:
+            if schedule_config.get('mode', 'batch') == 'per_api':
+                ttl = float(resolve_api_schedule(schedule_config, client.config)['interval_minutes']) * 60
+            else:
+                ttl = float(schedule_config.get('interval_minutes', 720)) * 60
+        ttls[client.name] = float(ttl)
+    return ttls
+
+
+def run_keeper_task(api_names=None, on_result=None, runtime=None, shard=None, strategy=None, use_leases=True):
+    if runtime is None:
+        runtime = KeeperRuntime('config.yaml')
+    runtime.refresh()
+    
+    config_loader = runtime.config_loader
+    logger = runtime.logger
+    
+    logger.log_info("=" * 50)
+    logger.log_info("NewAPI Keeper Started")
+    logger.log_info("=" * 50)
+    
+    deadline_config = config_loader.get_deadline_config()
+    deadline = get_deadline(deadline_config)
+    if deadline.limited:
+        logger.log_info(f"Run deadline: {deadline.budget:.0f}s")
+    
+    clients = runtime.get_clients(api_names)
+    if not clients:
+        logger.log_error("No enabled APIs found in configuration")
+        return
+    
+    logger.log_info(f"Found {len(clients)} enabled API(s)")
+    
+    if shard is not None:
+        index, count = shard
+        clients = clients[index::count]
+        logger.log_info(f"Worker {index + 1}/{count} handling {len(clients)} API(s)")
+    
+    # 手动触发的按需检查不受租约限制，也不占用租约，定时执行仍按租约分片
+    lease_store = runtime.lease_store if use_leases else None
+    if lease_store is not None:
+        acquired = set(lease_store.acquire_many(lease_ttls(config_loader, clients)))
+        logger.log_info(
+            f"Sharding: {lease_store.owner} acquired {len(acquired)} of {len(clients)} lease(s)"
+        )
+        clients = [client for client in clients if client.name in acquired]
+    
+    if not clients:
+        logger.log_info("No APIs to ping in this run")
+        return
+    
+    strategies, pool = runtime.strategies, runtime.prompt_pool
+    if strategy is not None:
+        strategies = select_strategies(runtime, strategy)
+        # 预取池中的提示词来自所有策略，指定策略时直接同步生成
+        pool = None
+        if not strategies:
+            logger.log_error(f"Strategy not found in configuration: {strategy}")
+            return
+    
+    next_prompt = None
+    if any(client.probe_mode == 'completion' for client in clients):
+        next_prompt = make_prompt_supplier(
+            strategies, logger, config_loader.get_strategy_race_config(), pool,
+            deadline, deadline_config.get('prompt_share', 0.2)
+        )
+        if pool is None:
+            prompt, _ = next_prompt()
+            if not prompt:
+                # 探测模式的 API 不依赖提示词，仍然继续执行
+                clients = [client for client in clients if client.probe_mode != 'completion']
+                if not clients:
+                    return
+    else:
+        logger.log_info("All selected APIs use probe mode, skipping prompt generation")
+    logger.log_info("=" * 50)
+    
+    concurrency_config = config_loader.get_concurrency_config()
+    if concurrency_config.get('enabled', False):
+        success_count, failed_count = dispatch_concurrent(
+            clients, next_prompt, logger, concurrency_config, on_result, deadline
+        )
+    else:
+        success_count, failed_count = dispatch_sequential(
+            clients, next_prompt, logger, on_result, deadline
+        )
+    
     logger.log_info("=" * 50)
     logger.log_info(f"Summary: {success_count} succeeded, {failed_count} failed")
+    writer_stats = logger.get_writer_stats()
+    if writer_stats.get('dropped') or writer_stats.get('delayed'):
+        logger.log_info(
+            f"Detail log backpressure: {writer_stats['dropped']} dropped, "
+            f"{writer_stats['delayed']} delayed"
+        )
+    if runtime.prompt_pool is not None:
+        pool_stats = runtime.prompt_pool.stats()
+        logger.log_info(
+            f"Prompt pool: {pool_stats['hits']} hits, {pool_stats['misses']} misses, "
+            f"{pool_stats['expired']} expired, {pool_stats['refilled']} refilled, "
+            f"{pool_stats['size']}/{pool_stats['capacity']} ready"
+        )
     logger.log_info("=" * 50)
 
 
-def main():
+def run_worker(index, count):
     try:
-        run_keeper_task()
+        run_keeper_task(shard=(index, count))
     except FileNotFoundError as e:
         print(f"Error: {e}")
         sys.exit(1)
@@ -106,5 +443,37 @@ def main():
         sys.exit(1)
 
 
+def run_worker_process(index, count):
+    # multiprocessing 子进程退出时不执行 atexit 回调，需手动刷新后台日志与历史记录
+    try:
+        run_worker(index, count)
+    finally:
+        log_writer.shutdown()
+        history_store.close_all()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='NewAPI Keeper')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Split APIs across this many worker processes (default: 1)')
+    args = parser.parse_args()
+    
+    if args.workers <= 1:
+        run_worker(0, 1)
+        return
+    
+    workers = [
+        multiprocessing.Process(target=run_worker_process, args=(index, args.workers), name=f'keeper-worker-{index}')
+        for index in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if any(worker.exitcode != 0 for worker in workers):
+        sys.exit(1)
+
+
 if __name__ == '__main__':
     main()
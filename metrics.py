@@ -0,0 +1,157 @@
+import bisect
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(series["sum"])}')
+                lines.append(f'{self.name}_count{labels} {series["count"]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    'newapi_keeper_requests_total',
+    'Keepalive requests by outcome',
+    ('api_name', 'model', 'outcome')
+))
+request_phase_seconds = registry.register(Histogram(
+    'newapi_keeper_request_phase_seconds',
+    'Per-phase request latency (connect, tls, ttfb, ttft, total)',
+    ('api_name', 'model', 'outcome', 'phase')
+))
+response_bytes_total = registry.register(Counter(
+    'newapi_keeper_response_bytes_total',
+    'Response body bytes received',
+    ('api_name', 'model', 'outcome')
+))
+tokens_total = registry.register(Counter(
+    'newapi_keeper_tokens_total',
+    'Tokens reported by upstream usage',
+    ('api_name', 'model', 'kind')
+))
+strategy_duration_seconds = registry.register(Histogram(
+    'newapi_keeper_strategy_duration_seconds',
+    'Prompt generation time per strategy',
+    ('strategy', 'outcome')
+))
+
+
+def record_request(result: Dict[str, Any]) -> None:
+    labels = {
+        'api_name': result.get('api_name', 'Unknown'),
+        'model': result.get('model', ''),
+        'outcome': 'success' if result.get('success') else result.get('error_type', 'error')
+    }
+    requests_total.inc(**labels)
+
+    for phase, value in (result.get('timings') or {}).items():
+        if value is not None:
+            request_phase_seconds.observe(value, phase=phase, **labels)
+
+    if result.get('body_bytes'):
+        response_bytes_total.inc(result['body_bytes'], **labels)
+
+    usage = result.get('usage') or {}
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage.get(kind):
+            tokens_total.inc(usage[kind], api_name=labels['api_name'], model=labels['model'], kind=kind)
+
+
+def record_strategy(strategy_type: str, duration: float, success: bool) -> None:
+    strategy_duration_seconds.observe(duration, strategy=strategy_type,
+                                      outcome='success' if success else 'failure')
+
+
+def render() -> str:
+    return registry.render()
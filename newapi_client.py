@@ -1,87 +1,354 @@
 import requests
-import json
+import random
+import time
 from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+import json_codec
+from deadline import Deadline, DeadlineExceeded
+from http_pool import get_session, reset_request_timings, current_request_timings
+from circuit_breaker import OPEN, HALF_OPEN, is_retryable, counts_as_breaker_failure
+
+
+PROBE_MODES = ('completion', 'minimal', 'models', 'tiered')
+MINIMAL_PROMPT = 'ping'
+# 端点不可达时升级为补全请求也无法成功，直接返回探测结果
+NO_ESCALATE_ERROR_TYPES = {'circuit_open', 'ssl', 'timeout', 'connection', 'deadline_exceeded'}
+MODELS_TIMEOUT = 30
 
 
 class NewAPIClient:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], circuit_breaker=None, retry_config: Optional[Dict[str, Any]] = None):
         self.config = config
         self.name = config.get('name', 'Unknown')
-        self.url = config['url'].rstrip('/') + '/chat/completions'
+        self.base_url = config['url'].rstrip('/')
+        self.url = self.base_url + '/chat/completions'
         self.api_key = config['api_key']
         self.model = config['model']
         self.max_tokens = config.get('max_tokens', 100)
         self.temperature = config.get('temperature', 0.7)
+        self.stream = config.get('stream', False)
+        self.abort_on_first_token = config.get('abort_on_first_token', False)
+        # 单次请求的超时上限，启用运行截止时间后取该值与剩余预算的较小值
+        self.timeout = config.get('timeout', 60)
+        self.probe_mode = config.get('probe_mode', 'completion')
+        if self.probe_mode not in PROBE_MODES:
+            raise ValueError(f"Unknown probe_mode for {self.name}: {self.probe_mode}")
         
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self.api_key}',
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json',
+            'Accept': 'text/event-stream' if self.stream else 'application/json',
         }
+        # 为空时使用 http_pool 中的全局传输设置
+        self.transport = config.get('transport')
+        self.http2 = config.get('http2')
+        
+        self.circuit_breaker = circuit_breaker
+        self.retry_config = retry_config or {}
+        if circuit_breaker is not None and circuit_breaker.key_by == 'host':
+            self.breaker_key = urlparse(self.url).netloc.lower()
+        else:
+            self.breaker_key = self.name
+
+    @property
+    def session(self):
+        # 每次请求时从连接池获取，空闲回收或连接池配置变化后自动换用新会话
+        return get_session(self.url, self.transport, self.http2)
+
+    def _new_sse_state(self) -> Dict[str, Any]:
+        return {'content_parts': [], 'model': self.model, 'usage': None, 'done': False}
+
+    def _feed_sse_line(self, state: Dict[str, Any], line: bytes) -> bool:
+        """处理一行 SSE 数据（原始 bytes，直接交给 JSON 解码），返回该行是否包含新的内容增量"""
+        line = line.strip()
+        if not line or not line.startswith(b'data:'):
+            return False
+        
+        data = line[5:].strip()
+        if data == b'[DONE]':
+            state['done'] = True
+            return False
+        
+        try:
+            chunk = json_codec.loads(data)
+        except json_codec.DecodeError:
+            return False
+        if not isinstance(chunk, dict):
+            return False
+        
+        if 'model' in chunk:
+            state['model'] = chunk['model']
+        if 'usage' in chunk and chunk['usage']:
+            state['usage'] = chunk['usage']
+        if 'choices' in chunk and chunk['choices']:
+            delta = chunk['choices'][0].get('delta', {})
+            if 'content' in delta and delta['content']:
+                state['content_parts'].append(delta['content'])
+                return True
+        return False
 
-    def _parse_sse_response(self, text: str) -> Dict[str, Any]:
+    def _finish_sse_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if not state['content_parts']:
+            raise ValueError("No content found in SSE response")
+        
+        return {
+            'content': ''.join(state['content_parts']),
+            'model': state['model'],
+            'usage': state['usage'] or {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }
+
+    def _parse_sse_response(self, body: bytes) -> Dict[str, Any]:
         """解析 SSE 流式响应，合并所有 chunk 的内容"""
-        content_parts = []
-        model = self.model
-        usage = None
-        
-        for line in text.split('\n'):
-            line = line.strip()
-            if not line or not line.startswith('data:'):
-                continue
-            
-            data_str = line[5:].strip()
-            if data_str == '[DONE]':
+        state = self._new_sse_state()
+        
+        for line in body.split(b'\n'):
+            self._feed_sse_line(state, line)
+            if state['done']:
                 break
-            
-            try:
-                chunk = json.loads(data_str)
-                if 'model' in chunk:
-                    model = chunk['model']
-                if 'usage' in chunk and chunk['usage']:
-                    usage = chunk['usage']
-                if 'choices' in chunk and chunk['choices']:
-                    delta = chunk['choices'][0].get('delta', {})
-                    if 'content' in delta and delta['content']:
-                        content_parts.append(delta['content'])
-            except json.JSONDecodeError:
-                continue
-        
-        if not content_parts:
-            raise ValueError("No content found in SSE response")
+        
+        return self._finish_sse_state(state)
+
+    def _consume_stream(self, response, prompt: str, started: float, deadline: Deadline) -> Dict[str, Any]:
+        """边接收边解析 SSE，记录首字节与首 token 时间，可在首个内容增量后提前断开"""
+        ttfb = time.monotonic() - started
+        ttft = None
+        aborted = False
+        state = self._new_sse_state()
+        timings = current_request_timings()
+        timings['ttfb'] = ttfb
+        body_bytes = 0
+        
+        try:
+            for raw_line in response.iter_lines():
+                body_bytes += len(raw_line) + 1
+                if not raw_line:
+                    continue
+                has_content = self._feed_sse_line(state, raw_line)
+                
+                if has_content and ttft is None:
+                    ttft = time.monotonic() - started
+                    if self.abort_on_first_token:
+                        aborted = True
+                        break
+                if state['done']:
+                    break
+                if deadline.expired():
+                    # 读超时只约束单次读取，持续慢速输出的流需要在这里按运行预算中止
+                    raise DeadlineExceeded("Run deadline exceeded while reading stream")
+        finally:
+            response.close()
+            timings['body_bytes'] = body_bytes
+        
+        try:
+            parsed = self._finish_sse_state(state)
+        except Exception as sse_err:
+            return {
+                'success': False,
+                'api_name': self.name,
+                'prompt': prompt,
+                'error': f"SSE stream error: {sse_err}",
+                'error_type': 'sse_parse',
+                'ttfb': ttfb
+            }
         
         return {
-            'content': ''.join(content_parts),
-            'model': model,
-            'usage': usage or {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            'success': True,
+            'api_name': self.name,
+            'prompt': prompt,
+            'response': parsed['content'],
+            'usage': parsed['usage'],
+            'model': parsed['model'],
+            'ttfb': ttfb,
+            'ttft': ttft,
+            'aborted_early': aborted
         }
 
-    def send_request(self, prompt: str) -> Optional[Dict[str, Any]]:
+    def _error_result(self, prompt: str, error: str, error_type: str) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'api_name': self.name,
+            'prompt': prompt,
+            'model': self.model,
+            'error': error,
+            'error_type': error_type,
+            'latency': 0.0,
+            'timings': {},
+            'body_bytes': 0
+        }
+
+    def deadline_result(self, prompt: str = '', error: str = "Run deadline exceeded, request skipped") -> Dict[str, Any]:
+        return self._error_result(prompt, error, 'deadline_exceeded')
+
+    def _probe(self, deadline: Deadline) -> Optional[str]:
+        """半开状态下用 GET /models 低成本探测端点，返回错误信息，可达时返回 None"""
+        timeout = deadline.timeout(self.circuit_breaker.probe_timeout)
+        try:
+            response = self.session.get(
+                self.base_url + '/models',
+                headers=self.headers,
+                timeout=timeout
+            )
+            response.close()
+            if response.status_code >= 500:
+                return f"HTTP {response.status_code}"
+            return None
+        except requests.exceptions.RequestException as e:
+            return f"{type(e).__name__}: {str(e)}"
+
+    def keepalive(self, prompt: Optional[str], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """按 probe_mode 执行一次保活，结果中的 probe_tier 标明实际使用的探测层级"""
+        if self.probe_mode == 'completion':
+            result, tier = self.send_request(prompt, deadline=deadline), 'completion'
+        elif self.probe_mode == 'minimal':
+            result, tier = self.send_request(MINIMAL_PROMPT, max_tokens=1, deadline=deadline), 'minimal'
+        else:
+            result, tier = self.check_models(deadline), 'models'
+            # 分级模式：端点有响应但 /models 无法证明模型可用时才升级为最小补全请求
+            if (self.probe_mode == 'tiered' and result.get('error_type') not in NO_ESCALATE_ERROR_TYPES
+                    and not (result.get('success') and result.get('model_listed'))):
+                result, tier = self.send_request(MINIMAL_PROMPT, max_tokens=1, deadline=deadline), 'minimal'
+        
+        result['probe_tier'] = tier
+        return result
+
+    def send_request(self, prompt: str, max_tokens: Optional[int] = None,
+                     deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+        return self._execute(prompt, lambda d: self._send_request(prompt, max_tokens, d), deadline)
+
+    def check_models(self, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """GET /models 检查端点可达且配置的模型在列表中，不消耗 token"""
+        return self._execute('', self._models_request, deadline)
+
+    def _execute(self, prompt: str, request_fn, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        deadline = deadline or Deadline()
+        if deadline.exhausted():
+            return self.deadline_result(prompt)
+        
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            state = breaker.before_request(self.breaker_key)
+            if state == OPEN:
+                return self._error_result(prompt, f"Circuit open for {self.breaker_key}, request skipped", 'circuit_open')
+            if state == HALF_OPEN:
+                try:
+                    probe_error = self._probe(deadline)
+                except DeadlineExceeded:
+                    return self.deadline_result(prompt)
+                if probe_error and deadline.exhausted():
+                    return self.deadline_result(prompt)
+                if probe_error:
+                    breaker.record_failure(self.breaker_key)
+                    return self._error_result(prompt, f"Circuit probe failed: {probe_error}", 'circuit_open')
+        
+        max_attempts = max(1, int(self.retry_config.get('max_attempts', 1)))
+        base_delay = float(self.retry_config.get('base_delay', 1.0))
+        max_delay = float(self.retry_config.get('max_delay', 10.0))
+        
+        started = time.monotonic()
+        for attempt in range(1, max_attempts + 1):
+            result = self._send_attempt(lambda: request_fn(deadline))
+            if result.get('error_type') == 'timeout' and deadline.exhausted():
+                # 超时由运行预算耗尽导致，不代表端点异常，不计入熔断
+                result['error_type'] = 'deadline_exceeded'
+            if result.get('success') or attempt == max_attempts or not is_retryable(result):
+                break
+            # 指数退避 + 全抖动；剩余预算不够下一次尝试时不再重试
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            remaining = deadline.remaining()
+            if remaining is not None and remaining < delay + deadline.min_request_timeout:
+                break
+            time.sleep(delay)
+        
+        result['attempts'] = attempt
+        result['latency'] = time.monotonic() - started
+        
+        if breaker is not None:
+            if result.get('success'):
+                breaker.record_success(self.breaker_key)
+            elif counts_as_breaker_failure(result):
+                breaker.record_failure(self.breaker_key)
+        return result
+
+    def _send_attempt(self, request_fn) -> Dict[str, Any]:
+        timings = reset_request_timings()
+        started = time.monotonic()
+        result = request_fn()
+        result['latency'] = time.monotonic() - started
+        result.setdefault('model', self.model)
+        
+        timings['total'] = result['latency']
+        if result.get('ttft') is not None:
+            timings['ttft'] = result['ttft']
+        result['body_bytes'] = timings.pop('body_bytes', 0)
+        # 以下划线开头的是传输层的中间计时，不写入结果
+        result['timings'] = {name: value for name, value in timings.items() if not name.startswith('_')}
+        return result
+
+    def _models_request(self, deadline: Deadline) -> Dict[str, Any]:
+        try:
+            response = self.session.get(self.base_url + '/models', headers=self.headers,
+                                        timeout=deadline.timeout(min(MODELS_TIMEOUT, self.timeout)))
+            
+            timings = current_request_timings()
+            timings['ttfb'] = response.elapsed.total_seconds()
+            timings['body_bytes'] = len(response.content)
+            
+            if response.status_code != 200:
+                return self._http_error_result('', response)
+            
+            try:
+                models = [item.get('id') for item in json_codec.loads(response.content).get('data', [])]
+            except Exception:
+                models = []
+            
+            return {
+                'success': True,
+                'api_name': self.name,
+                'prompt': '',
+                'response': '',
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+                'model': self.model,
+                'model_listed': self.model in models
+            }
+        except Exception as e:
+            return self._exception_result('', e)
+
+    def _send_request(self, prompt: str, max_tokens: Optional[int], deadline: Deadline) -> Optional[Dict[str, Any]]:
         try:
             payload = {
                 'model': self.model,
                 'messages': [
                     {'role': 'user', 'content': prompt}
                 ],
-                'max_tokens': self.max_tokens,
+                'max_tokens': max_tokens or self.max_tokens,
                 'temperature': self.temperature,
-                'stream': False
+                'stream': self.stream
             }
             
-            response = requests.post(
+            started = time.monotonic()
+            response = self.session.post(
                 self.url,
                 headers=self.headers,
-                json=payload,
-                timeout=60
+                data=json_codec.dumps(payload),
+                timeout=deadline.timeout(self.timeout),
+                stream=self.stream
             )
             
+            content_type = response.headers.get('Content-Type', '')
+            if response.status_code == 200 and self.stream and 'application/json' not in content_type:
+                return self._consume_stream(response, prompt, started, deadline)
+            
+            timings = current_request_timings()
+            timings['ttfb'] = response.elapsed.total_seconds()
+            timings['body_bytes'] = len(response.content)
+            
             if response.status_code == 200:
-                response_text = response.text
+                body = response.content
                 
-                if response_text.startswith('data:'):
+                if body.startswith(b'data:'):
                     try:
-                        parsed = self._parse_sse_response(response_text)
+                        parsed = self._parse_sse_response(body)
                         return {
                             'success': True,
                             'api_name': self.name,
@@ -95,18 +362,20 @@ class NewAPIClient:
                             'success': False,
                             'api_name': self.name,
                             'prompt': prompt,
-                            'error': f"SSE parse error: {sse_err}. Raw: {response_text[:300]}"
+                            'error': f"SSE parse error: {sse_err}. Raw: {response.text[:300]}",
+                            'error_type': 'sse_parse'
                         }
                 
                 try:
-                    data = response.json()
+                    data = json_codec.loads(body)
                 except Exception as json_err:
-                    raw_text = response_text[:500] if response_text else "(empty response)"
+                    raw_text = response.text[:500] if body else "(empty response)"
                     return {
                         'success': False,
                         'api_name': self.name,
                         'prompt': prompt,
-                        'error': f"JSON parse error: {json_err}. Raw response: {raw_text}"
+                        'error': f"JSON parse error: {json_err}. Raw response: {raw_text}",
+                        'error_type': 'json_parse'
                     }
                 
                 usage = data.get('usage', {})
@@ -126,49 +395,48 @@ class NewAPIClient:
                     'model': data.get('model', self.model)
                 }
             else:
-                error_detail = ""
-                try:
-                    error_data = response.json()
-                    if 'error' in error_data:
-                        err = error_data['error']
-                        error_detail = err.get('message', '') or err.get('msg', '') or str(err)
-                    else:
-                        error_detail = response.text[:300]
-                except:
-                    error_detail = response.text[:300] if response.text else "(empty response)"
-                
-                return {
-                    'success': False,
-                    'api_name': self.name,
-                    'prompt': prompt,
-                    'error': f"HTTP {response.status_code}: {error_detail}"
-                }
+                return self._http_error_result(prompt, response)
         
-        except requests.exceptions.SSLError as e:
-            return {
-                'success': False,
-                'api_name': self.name,
-                'prompt': prompt,
-                'error': f"SSL Error: {str(e)}"
-            }
-        except requests.exceptions.Timeout as e:
-            return {
-                'success': False,
-                'api_name': self.name,
-                'prompt': prompt,
-                'error': f"Timeout: {str(e)}"
-            }
-        except requests.exceptions.ConnectionError as e:
-            return {
-                'success': False,
-                'api_name': self.name,
-                'prompt': prompt,
-                'error': f"Connection Error: {str(e)}"
-            }
         except Exception as e:
-            return {
-                'success': False,
-                'api_name': self.name,
-                'prompt': prompt,
-                'error': f"{type(e).__name__}: {str(e)}"
-            }
+            return self._exception_result(prompt, e)
+
+    def _http_error_result(self, prompt: str, response) -> Dict[str, Any]:
+        error_detail = ""
+        try:
+            error_data = json_codec.loads(response.content)
+            if 'error' in error_data:
+                err = error_data['error']
+                error_detail = err.get('message', '') or err.get('msg', '') or str(err)
+            else:
+                error_detail = response.text[:300]
+        except:
+            error_detail = response.text[:300] if response.text else "(empty response)"
+        
+        return {
+            'success': False,
+            'api_name': self.name,
+            'prompt': prompt,
+            'error': f"HTTP {response.status_code}: {error_detail}",
+            'error_type': 'http',
+            'status_code': response.status_code
+        }
+
+    def _exception_result(self, prompt: str, e: Exception) -> Dict[str, Any]:
+        if isinstance(e, DeadlineExceeded):
+            error, error_type = str(e), 'deadline_exceeded'
+        elif isinstance(e, requests.exceptions.SSLError):
+            error, error_type = f"SSL Error: {str(e)}", 'ssl'
+        elif isinstance(e, requests.exceptions.Timeout):
+            error, error_type = f"Timeout: {str(e)}", 'timeout'
+        elif isinstance(e, requests.exceptions.ConnectionError):
+            error, error_type = f"Connection Error: {str(e)}", 'connection'
+        else:
+            error, error_type = f"{type(e).__name__}: {str(e)}", type(e).__name__
+        
+        return {
+            'success': False,
+            'api_name': self.name,
+            'prompt': prompt,
+            'error': error,
+            'error_type': error_type
+        }
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+
+class PromptPool:
+    """后台线程预先生成提示词并保存在有界队列中，请求时 O(1) 取出，超过 max_age 的提示词自动丢弃；
+    只在有需求时补充：最近 idle_timeout 秒内有取用，或 demand 报告 lead_time 秒内将有请求"""
+    
+    def __init__(self, strategies: List[Tuple[str, Any]], generate: Callable[[str, Any], Optional[str]],
+                 capacity: int = 20, max_age: float = 600, retry_interval: float = 30, logger=None,
+                 lead_time: float = 120, idle_timeout: float = 60,
+                 demand: Optional[Callable[[float], int]] = None):
+        self.strategies = strategies
+        self.generate = generate
+        self.capacity = max(1, capacity)
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self.logger = logger
+        self.lead_time = lead_time
+        self.idle_timeout = idle_timeout
+        self.demand = demand
+        self._active_until = 0.0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._refilled = 0
+        self._refill_failures = 0
+        self._thread = threading.Thread(target=self._run, name='prompt-pool', daemon=True)
+        self._thread.start()
+    
+    def take(self) -> Optional[Tuple[str, str]]:
+        """取出一个未过期的提示词，返回 (prompt, strategy_type)；池为空时返回 None"""
+        with self._cond:
+            self._active_until = time.monotonic() + self.idle_timeout
+            self._drop_expired()
+            if not self._items:
+                self._misses += 1
+                self._cond.notify()
+                return None
+            
+            _, prompt, strategy_type = self._items.popleft()
+            self._hits += 1
+            self._cond.notify()
+            return prompt, strategy_type
+    
+    def _target(self) -> int:
+        """当前应保持的提示词数：运行进行中补满，临近调度时按即将发出的请求数补充，空闲时不补充"""
+        if time.monotonic() < self._active_until:
+            return self.capacity
+        if self.demand is None:
+            return 0
+        try:
+            upcoming = self.demand(self.lead_time)
+        except Exception:
+            return 0
+        return min(self.capacity, max(0, upcoming))
+    
+    def _drop_expired(self) -> None:
+        # 队列按生成时间排列，只需从队头检查
+        cutoff = time.monotonic() - self.max_age
+        while self._items and self._items[0][0] < cutoff:
+            self._items.popleft()
+            self._expired += 1
+    
+    def _produce(self) -> Optional[Tuple[str, str]]:
+        for strategy_type, strategy in self.strategies:
+            try:
+                prompt = self.generate(strategy_type, strategy)
+            except Exception:
+                continue
+            if prompt:
+                return prompt, strategy_type
+        return None
+    
+    def _run(self) -> None:
+        failing = False
+        while True:
+            # demand 回调可能需要获取调用方的锁，不在持有 _cond 时调用
+            target = self._target()
+            with self._cond:
+                self._drop_expired()
+                if self._stopped:
+                    return
+                if len(self._items) >= target:
+                    # 池满或空闲时定期醒来，清理过期提示词并检查是否临近下一次调度
+                    self._cond.wait(timeout=max(1.0, min(self.max_age / 4, self.lead_time / 4)))
+                    continue
+            
+            item = self._produce()
+            with self._cond:
+                if item is None:
+                    self._refill_failures += 1
+                    if not failing and self.logger is not None:
+                        self.logger.log_strategy_failure('prompt_pool', "All strategies failed during refill")
+                    failing = True
+                    if not self._stopped:
+                        self._cond.wait(timeout=self.retry_interval)
+                    continue
+                
+                failing = False
+                self._items.append((time.monotonic(), item[0], item[1]))
+                self._refilled += 1
+    
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'size': len(self._items),
+                'capacity': self.capacity,
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'refilled': self._refilled,
+                'refill_failures': self._refill_failures
+            }
+
+
+def get_prompt_pool(config: Dict[str, Any], strategies: List[Tuple[str, Any]],
+                    generate: Callable[[str, Any], Optional[str]], logger=None,
+                    demand: Optional[Callable[[float], int]] = None) -> Optional[PromptPool]:
+    if not config.get('enabled', False) or not strategies:
+        return None
+    
+    return PromptPool(
+        strategies,
+        generate,
+        capacity=config.get('capacity', 20),
+        max_age=config.get('max_age', 600),
+        retry_interval=config.get('retry_interval', 30),
+        logger=logger,
+        lead_time=config.get('lead_time', 120),
+        idle_timeout=config.get('idle_timeout', 60),
+        demand=demand
+    )
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from config_loader import ConfigLoader
+from logger import APILogger
+from newapi_client import NewAPIClient
+from http_pool import session_pool
+from circuit_breaker import get_circuit_breaker
+from prompt_pool import PromptPool, get_prompt_pool
+from lease_store import LeaseStore, get_lease_store
+
+
+def _fingerprint(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class KeeperRuntime:
+    """长期存活的运行上下文：配置文件变化时才重新解析，按差异重建客户端与策略，日志只初始化一次"""
+    
+    def __init__(self, config_path: str = 'config.yaml'):
+        self.config_path = Path(config_path)
+        self.config_loader: Optional[ConfigLoader] = None
+        self.logger: Optional[APILogger] = None
+        self.strategies: List[Tuple[str, Any]] = []
+        self.prompt_pool: Optional[PromptPool] = None
+        self.lease_store: Optional[LeaseStore] = None
+        self.clients: Dict[str, NewAPIClient] = {}
+        self._file_stat: Optional[Tuple[float, int]] = None
+        self._file_hash: Optional[str] = None
+        self._section_hashes: Dict[str, str] = {}
+        self._client_hashes: Dict[str, str] = {}
+        self._reload_listeners: List[Callable[[ConfigLoader], None]] = []
+        # 返回未来若干秒内将发出的请求数，由调度方（app.py）设置，提示词池据此在临近调度时补充
+        self.demand_provider: Optional[Callable[[float], int]] = None
+        self._lock = threading.RLock()
+    
+    def add_reload_listener(self, listener: Callable[[ConfigLoader], None]) -> None:
+        """注册热加载回调：配置重新加载成功后（不含首次加载）以新的 ConfigLoader 调用"""
+        self._reload_listeners.append(listener)
+    
+    def refresh(self) -> bool:
+        """检查配置文件，内容变化时重新加载并返回 True；重新加载失败时保留旧配置"""
+        with self._lock:
+            first_load = self.config_loader is None
+            reloaded = self._reload()
+            config_loader = self.config_loader
+        
+        if reloaded and not first_load:
+            for listener in list(self._reload_listeners):
+                try:
+                    listener(config_loader)
+                except Exception as e:
+                    self.logger.log_error(f"Reload listener failed: {str(e)}")
+        return reloaded
+    
+    def _reload(self) -> bool:
+        try:
+            stat = os.stat(self.config_path)
+        except FileNotFoundError:
+            if self.config_loader is None:
+                raise
+            return False
+        
+        file_stat = (stat.st_mtime, stat.st_size)
+        if self.config_loader is not None and file_stat == self._file_stat:
+            return False
+        
+        with open(self.config_path, 'rb') as f:
+            file_hash = hashlib.sha256(f.read()).hexdigest()
+        self._file_stat = file_stat
+        if file_hash == self._file_hash:
+            return False
+        
+        try:
+            config_loader = ConfigLoader(str(self.config_path))
+        except Exception as e:
+            if self.config_loader is None:
+                raise
+            self.logger.log_error(f"Failed to reload configuration, keeping previous one: {str(e)}")
+            return False
+        
+        try:
+            self._apply(config_loader)
+        except Exception as e:
+            if self.config_loader is None:
+                raise
+            # 文件内容哈希不更新：修正配置文件后会再次尝试加载
+            self.logger.log_error(f"Failed to apply reloaded configuration, keeping previous one: {str(e)}")
+            return False
+        self._file_hash = file_hash
+        return True
+
+    def _apply(self, config_loader: ConfigLoader) -> None:
+        """先构建新的客户端与策略等可能失败的部分，全部成功后再替换当前状态；失败时旧状态保持不变"""
+        first_load = self.config_loader is None
+        sections = {
+            'logging': config_loader.get_logging_config(),
+            'http_pool': config_loader.get_http_pool_config(),
+            'strategies': config_loader.get_strategies_config(),
+            'prompt_pool': config_loader.get_prompt_pool_config(),
+            'sharding': config_loader.get_sharding_config(),
+            'client_options': {
+                'circuit_breaker': config_loader.get_circuit_breaker_config(),
+                'retry': config_loader.get_retry_config()
+            }
+        }
+        hashes = {name: _fingerprint(value) for name, value in sections.items()}
+        changed = {name for name, digest in hashes.items() if self._section_hashes.get(name) != digest}
+        
+        clients, client_hashes, rebuilt = self._build_clients(
+            config_loader.get_apis_config(), 'client_options' in changed, self.client_options(config_loader)
+        )
+        
+        strategies = self.strategies
+        if 'strategies' in changed:
+            # 延迟导入，避免与 main 模块循环依赖
+            from main import build_strategies
+            strategies = build_strategies(sections['strategies'])
+        
+        lease_store = self.lease_store
+        if 'sharding' in changed:
+            lease_store = get_lease_store(sections['sharding'])
+        
+        if 'http_pool' in changed:
+            # configure 先校验再修改，传输类型无效时不会改动连接池
+            session_pool.configure(sections['http_pool'])
+        
+        logger = self.logger
+        if 'logging' in changed:
+            logger = APILogger(sections['logging'])
+        
+        prompt_pool = self.prompt_pool
+        if 'strategies' in changed or 'prompt_pool' in changed:
+            from main import timed_generate
+            prompt_pool = get_prompt_pool(sections['prompt_pool'], strategies, timed_generate, logger,
+                                          self.upcoming_requests)
+            if self.prompt_pool is not None:
+                self.prompt_pool.close()
+        
+        self.config_loader = config_loader
+        self.logger = logger
+        self.strategies = strategies
+        self.prompt_pool = prompt_pool
+        self.lease_store = lease_store
+        self.clients = clients
+        self._client_hashes = client_hashes
+        self._section_hashes = hashes
+        
+        if not first_load:
+            self.logger.log_info(f"Configuration reloaded, {rebuilt} client(s) rebuilt")
+    
+    def upcoming_requests(self, within: float) -> int:
+        provider = self.demand_provider
+        return provider(within) if provider is not None else 0
+    
+    def client_options(self, config_loader: Optional[ConfigLoader] = None) -> Dict[str, Any]:
+        config_loader = config_loader or self.config_loader
+        return {
+            'circuit_breaker': get_circuit_breaker(config_loader.get_circuit_breaker_config()),
+            'retry_config': config_loader.get_retry_config()
+        }
+    
+    def _build_clients(self, apis_config: List[Dict[str, Any]], rebuild_all: bool,
+                       options: Dict[str, Any]) -> Tuple[Dict[str, NewAPIClient], Dict[str, str], int]:
+        clients = {}
+        hashes = {}
+        rebuilt = 0
+        
+        for api_config in apis_config:
+            name = api_config['name']
+            if name in hashes:
+                # 名称重复时按出现顺序区分，避免后者覆盖前者
+                name = f"{name}#{len(hashes)}"
+            digest = _fingerprint(api_config)
+            if not rebuild_all and self._client_hashes.get(name) == digest and name in self.clients:
+                clients[name] = self.clients[name]
+            else:
+                clients[name] = NewAPIClient(api_config, **options)
+                rebuilt += 1
+            hashes[name] = digest
+        
+        return clients, hashes, rebuilt
+    
+    def get_clients(self, api_names=None) -> List[NewAPIClient]:
+        with self._lock:
+            return [client for client in self.clients.values()
+                    if api_names is None or client.name in api_names]
@@ -0,0 +1,61 @@
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+
+DEFAULT_INTERVAL_MINUTES = 720
+
+
+def parse_window(window: str) -> Tuple[dt_time, dt_time]:
+    """解析 'HH:MM-HH:MM' 格式的时间窗口，结束时间早于开始时间表示跨越午夜"""
+    start, end = window.split('-', 1)
+    return (datetime.strptime(start.strip(), '%H:%M').time(),
+            datetime.strptime(end.strip(), '%H:%M').time())
+
+
+def in_time_windows(windows: Optional[List[str]], now: datetime) -> bool:
+    if not windows:
+        return True
+    
+    current = now.time()
+    for window in windows:
+        start, end = parse_window(window)
+        if start <= end:
+            if start <= current < end:
+                return True
+        elif current >= start or current < end:
+            return True
+    return False
+
+
+def resolve_api_schedule(schedule_config: Dict[str, Any], api_config: Dict[str, Any]) -> Dict[str, Any]:
+    """单个 API 的 schedule 配置覆盖全局 schedule 配置"""
+    resolved = {
+        'interval_minutes': schedule_config.get('interval_minutes', DEFAULT_INTERVAL_MINUTES),
+        'jitter': schedule_config.get('jitter', 0),
+        'windows': schedule_config.get('windows'),
+        'skip_if_success_within': schedule_config.get('skip_if_success_within', 0)
+    }
+    resolved.update(api_config.get('schedule') or {})
+    return resolved
+
+
+def build_api_schedules(schedule_config: Dict[str, Any], apis_config: List[Dict[str, Any]],
+                        now: datetime) -> List[Dict[str, Any]]:
+    """为每个 API 生成调度计划，相同间隔的 API 在一个间隔内均匀错开首次执行时间"""
+    groups: Dict[float, List[Dict[str, Any]]] = {}
+    for api_config in apis_config:
+        schedule = resolve_api_schedule(schedule_config, api_config)
+        interval = float(schedule['interval_minutes']) * 60
+        groups.setdefault(interval, []).append({
+            'api_name': api_config['name'],
+            'interval': interval,
+            'jitter': int(schedule['jitter']) or None,
+            'schedule': schedule
+        })
+    
+    plans = []
+    for interval, group in groups.items():
+        for index, plan in enumerate(group):
+            plan['first_run'] = now + timedelta(seconds=interval * index / len(group))
+            plans.append(plan)
+    return plans
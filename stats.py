@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from typing import Dict, Any, Optional, Sequence
+
+import json_codec
+from metrics import DEFAULT_BUCKETS
+
+
+# 窗口名称、覆盖秒数、槽位数：1h 每槽 1 分钟，24h 每槽 15 分钟，7d 每槽 1 小时
+WINDOWS = (
+    ('1h', 3600, 60),
+    ('24h', 86400, 96),
+    ('7d', 604800, 168)
+)
+QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+
+def histogram_quantile(buckets: Sequence[float], counts: Sequence[int], total: int, q: float) -> Optional[float]:
+    """按直方图估算分位数，桶内线性插值；落在 +Inf 桶时返回最大的有限上界"""
+    if total <= 0:
+        return None
+    rank = q * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if cumulative + count >= rank and count:
+            if i >= len(buckets):
+                return buckets[-1]
+            lower = buckets[i - 1] if i > 0 else 0.0
+            return lower + (buckets[i] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-1]
+
+
+class RingWindow:
+    """固定槽位的时间环：写入与时间推进时只清理过期槽位并增量修正窗口总和，读取不需要遍历槽位"""
+
+    def __init__(self, span: float, slots: int, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.width = span / slots
+        self.slots = slots
+        self.buckets = tuple(buckets)
+        self._requests = [0] * slots
+        self._successes = [0] * slots
+        self._tokens = [0] * slots
+        self._latency = [[0] * (len(self.buckets) + 1) for _ in range(slots)]
+        self._head = None
+        self.requests = 0
+        self.successes = 0
+        self.tokens = 0
+        self.latency_counts = [0] * (len(self.buckets) + 1)
+        self.latency_total = 0
+
+    def _clear(self, index: int) -> None:
+        self.requests -= self._requests[index]
+        self.successes -= self._successes[index]
+        self.tokens -= self._tokens[index]
+        slot = self._latency[index]
+        for i, count in enumerate(slot):
+            if count:
+                self.latency_counts[i] -= count
+                self.latency_total -= count
+                slot[i] = 0
+        self._requests[index] = self._successes[index] = self._tokens[index] = 0
+
+    def advance(self, now: float) -> None:
+        epoch = int(now // self.width)
+        if self._head is None:
+            self._head = epoch
+            return
+        if epoch <= self._head:
+            return
+        # 跳过的槽位最多清理一整圈
+        for e in range(max(self._head + 1, epoch - self.slots + 1), epoch + 1):
+            self._clear(e % self.slots)
+        self._head = epoch
+
+    def add(self, now: float, success: bool, latency: Optional[float], tokens: int) -> None:
+        self.advance(now)
+        epoch = int(now // self.width)
+        if epoch <= self._head - self.slots:
+            return
+        index = epoch % self.slots
+        self._requests[index] += 1
+        self.requests += 1
+        if success:
+            self._successes[index] += 1
+            self.successes += 1
+            self._tokens[index] += tokens
+            self.tokens += tokens
+        if latency is not None:
+            bucket = bisect.bisect_left(self.buckets, latency)
+            self._latency[index][bucket] += 1
+            self.latency_counts[bucket] += 1
+            self.latency_total += 1
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            'requests': self.requests,
+            'successes': self.successes,
+            'success_rate': round(self.successes / self.requests, 4) if self.requests else None,
+            'tokens': self.tokens
+        }
+        for name, q in QUANTILES:
+            value = histogram_quantile(self.buckets, self.latency_counts, self.latency_total, q)
+            summary[name] = round(value, 3) if value is not None else None
+        return summary
+
+
+class APIStats:
+    def __init__(self):
+        self.windows = {name: RingWindow(span, slots) for name, span, slots in WINDOWS}
+        self.last_success = None
+        self.last_request = None
+
+    def add(self, now: float, success: bool, latency: Optional[float], tokens: int) -> None:
+        self.last_request = now
+        if success:
+            self.last_success = now
+        for window in self.windows.values():
+            window.add(now, success, latency, tokens)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        snapshot = {'last_success': self.last_success, 'last_request': self.last_request}
+        for name, window in self.windows.items():
+            window.advance(now)
+            snapshot[name] = window.summary()
+        return snapshot
+
+
+def diff_snapshot(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    """返回 new 中与 old 不同的字段，窗口内只保留变化的计数"""
+    if old is None:
+        return new
+
+    changes = {}
+    for key, value in new.items():
+        if isinstance(value, dict):
+            changed = {field: v for field, v in value.items() if old.get(key, {}).get(field) != v}
+            if changed:
+                changes[key] = changed
+        elif old.get(key) != value:
+            changes[key] = value
+    return changes
+
+
+class RollingStats:
+    """进程内按 API 维护的滚动聚合；每个 API 的快照在写入时更新，/api/stats 直接返回缓存的结果"""
+
+    def __init__(self):
+        self._apis: Dict[str, APIStats] = {}
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._payload = None
+        # 最小窗口的下一个槽位边界，之后槽位过期，缓存的快照需要重新计算
+        self._refresh_at = 0.0
+
+    def record(self, result: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+        """写入一次请求结果，返回该 API 快照中发生变化的字段"""
+        now = time.time() if now is None else now
+        api_name = result.get('api_name', 'Unknown')
+        success = bool(result.get('success'))
+        latency = (result.get('timings') or {}).get('total', result.get('latency'))
+        tokens = ((result.get('usage') or {}).get('total_tokens') or 0) if success else 0
+
+        with self._lock:
+            api = self._apis.get(api_name)
+            if api is None:
+                api = APIStats()
+                self._apis[api_name] = api
+            api.add(now, success, latency, tokens)
+            snapshot = api.snapshot(now)
+            changes = diff_snapshot(self._snapshots.get(api_name), snapshot)
+            self._snapshots[api_name] = snapshot
+            self._payload = None
+            return changes
+
+    def _refresh(self, now: float) -> None:
+        for api_name, api in self._apis.items():
+            self._snapshots[api_name] = api.snapshot(now)
+        width = WINDOWS[0][1] / WINDOWS[0][2]
+        self._refresh_at = (now // width + 1) * width
+        self._payload = None
+
+    def render(self, now: Optional[float] = None) -> bytes:
+        """返回 JSON（UTF-8 bytes）；没有新结果且没有槽位过期时直接复用上次序列化的结果"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now >= self._refresh_at:
+                self._refresh(now)
+            if self._payload is None:
+                self._payload = json_codec.dumps({
+                    'windows': [name for name, _, _ in WINDOWS],
+                    'apis': self._snapshots
+                })
+            return self._payload
+
+
+rolling_stats = RollingStats()
+
+
+def record_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    return rolling_stats.record(result)
+
+
+def render() -> bytes:
+    return rolling_stats.render()
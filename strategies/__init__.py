@@ -1,11 +1,30 @@
 from .base_strategy import BaseStrategy
-from .news_strategy import NewsStrategy
-from .webpage_strategy import WebpageStrategy
-from .random_question_strategy import RandomQuestionStrategy
+from .registry import create_strategy, register_strategy
+
+# 具体策略类按需导入，避免只用 random_question 时也加载 feedparser 等依赖
+_LAZY_CLASSES = {
+    'NewsStrategy': '.news_strategy',
+    'WebpageStrategy': '.webpage_strategy',
+    'RandomQuestionStrategy': '.random_question_strategy'
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_CLASSES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     'BaseStrategy',
     'NewsStrategy',
     'WebpageStrategy',
-    'RandomQuestionStrategy'
+    'RandomQuestionStrategy',
+    'create_strategy',
+    'register_strategy'
 ]
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import feedparser
+
+
+class FeedCache:
+    """按 URL 缓存 RSS 解析结果，过期后使用 ETag/Last-Modified 发起条件请求"""
+
+    def __init__(self, path: str, ttl: float = 600, max_entries: int = 50, keep_items: int = 10):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.keep_items = keep_items
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _evict(self) -> None:
+        if len(self._entries) <= self.max_entries:
+            return
+        by_age = sorted(self._entries.items(), key=lambda item: item[1].get('fetched_at', 0))
+        for url, _ in by_age[:len(self._entries) - self.max_entries]:
+            del self._entries[url]
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def get_titles(self, url: str) -> List[str]:
+        # 同一 URL 的并发请求只抓取一次，其余等待后直接命中缓存；不同 URL 并行抓取，缓存锁不跨网络请求持有
+        with self._url_lock(url):
+            with self._lock:
+                cached = self._load().get(url)
+                now = time.time()
+                if cached and now - cached.get('fetched_at', 0) < self.ttl:
+                    return cached['titles']
+
+            kwargs = {}
+            if cached:
+                if cached.get('etag'):
+                    kwargs['etag'] = cached['etag']
+                if cached.get('modified'):
+                    kwargs['modified'] = cached['modified']
+
+            feed = feedparser.parse(url, **kwargs)
+
+            with self._lock:
+                entries = self._load()
+                if cached and feed.get('status') == 304:
+                    cached['fetched_at'] = now
+                    entries[url] = cached
+                    self._evict()
+                    self._save()
+                    return cached['titles']
+
+                titles = [entry.get('title', '') for entry in feed.entries[:self.keep_items]]
+                titles = [title for title in titles if title]
+                if not titles:
+                    # 源暂时不可用时继续使用旧数据，但不刷新时间戳
+                    return cached['titles'] if cached else []
+
+                entries[url] = {
+                    'etag': feed.get('etag'),
+                    'modified': feed.get('modified'),
+                    'fetched_at': now,
+                    'titles': titles
+                }
+                self._evict()
+                self._save()
+                return titles
+
+
+_caches: Dict[str, FeedCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_feed_cache(config: Dict[str, Any]) -> FeedCache:
+    path = config.get('path', './logs/feed_cache.json')
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = FeedCache(path)
+            _caches[path] = cache
+        cache.ttl = config.get('ttl', 600)
+        cache.max_entries = config.get('max_entries', 50)
+        return cache
@@ -3,6 +3,7 @@ import feedparser
 import requests
 from typing import Optional
 from .base_strategy import BaseStrategy
+from .feed_cache import get_feed_cache
 
 
 class NewsStrategy(BaseStrategy):
@@ -15,13 +16,18 @@ class NewsStrategy(BaseStrategy):
                 return None
             
             rss_url = random.choice(rss_urls)
-            feed = feedparser.parse(rss_url)
+            cache_config = config.get('cache', {})
             
-            if not feed.entries:
+            if cache_config.get('enabled', True):
+                titles = get_feed_cache(cache_config).get_titles(rss_url)
+            else:
+                feed = feedparser.parse(rss_url)
+                titles = [entry.get('title', '') for entry in feed.entries[:10]]
+            
+            if not titles:
                 return None
             
-            entry = random.choice(feed.entries[:10])
-            news_title = entry.get('title', '')
+            news_title = random.choice(titles)
             
             max_length = config.get('max_news_length', 200)
             if len(news_title) > max_length:
@@ -0,0 +1,98 @@
+import importlib
+import threading
+from typing import Dict, Any, List, Optional, Union
+
+from .base_strategy import BaseStrategy
+
+
+ENTRY_POINT_GROUP = 'newapi_keeper.strategies'
+
+# 内置策略只记录 "模块:类名"，第一次使用时才导入对应模块（及其依赖的 feedparser 等）
+BUILTIN_STRATEGIES = {
+    'news': 'strategies.news_strategy:NewsStrategy',
+    'webpage': 'strategies.webpage_strategy:WebpageStrategy',
+    'random_question': 'strategies.random_question_strategy:RandomQuestionStrategy'
+}
+
+
+def load_target(target: str) -> type:
+    """解析 "package.module:ClassName" 并返回对应的类"""
+    module_name, _, attr = target.partition(':')
+    if not module_name or not attr:
+        raise ValueError(f"策略目标格式应为 'module:Class': {target}")
+
+    obj = importlib.import_module(module_name)
+    for part in attr.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _entry_points() -> list:
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=ENTRY_POINT_GROUP))
+    # Python 3.8/3.9 返回按 group 分组的 dict
+    return list(eps.get(ENTRY_POINT_GROUP, []))
+
+
+class StrategyRegistry:
+    """按 type 延迟解析策略类：内置策略与手动注册的策略优先，未知 type 才扫描 entry points"""
+
+    def __init__(self, builtins: Optional[Dict[str, str]] = None):
+        self._targets: Dict[str, Union[str, type]] = dict(builtins or {})
+        self._classes: Dict[str, type] = {}
+        self._entry_points_loaded = False
+        self._lock = threading.Lock()
+
+    def register(self, strategy_type: str, target: Union[str, type]) -> None:
+        """注册策略：target 为策略类或 "module:Class" 字符串"""
+        with self._lock:
+            self._targets[strategy_type] = target
+            self._classes.pop(strategy_type, None)
+
+    def _load_entry_points(self) -> None:
+        # 扫描已安装包的元数据较慢，只在遇到未知 type 时执行一次
+        self._entry_points_loaded = True
+        for ep in _entry_points():
+            self._targets.setdefault(ep.name, ep.value)
+
+    def resolve(self, strategy_type: str) -> Optional[type]:
+        with self._lock:
+            cls = self._classes.get(strategy_type)
+            if cls is not None:
+                return cls
+
+            if strategy_type not in self._targets and not self._entry_points_loaded:
+                self._load_entry_points()
+            target = self._targets.get(strategy_type)
+            if target is None:
+                return None
+
+            cls = load_target(target) if isinstance(target, str) else target
+            if not (isinstance(cls, type) and issubclass(cls, BaseStrategy)):
+                raise TypeError(f"策略 {strategy_type} 必须是 BaseStrategy 的子类: {target}")
+            self._classes[strategy_type] = cls
+            return cls
+
+    def available_types(self) -> List[str]:
+        with self._lock:
+            if not self._entry_points_loaded:
+                self._load_entry_points()
+            return sorted(self._targets)
+
+    def create(self, strategy_config: Dict[str, Any]) -> Optional[BaseStrategy]:
+        cls = self.resolve(strategy_config.get('type'))
+        return cls(strategy_config) if cls is not None else None
+
+
+registry = StrategyRegistry(BUILTIN_STRATEGIES)
+
+
+def register_strategy(strategy_type: str, target: Union[str, type]) -> None:
+    registry.register(strategy_type, target)
+
+
+def create_strategy(strategy_config: Dict[str, Any]) -> Optional[BaseStrategy]:
+    return registry.create(strategy_config)
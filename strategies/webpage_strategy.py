@@ -1,11 +1,94 @@
 import random
+import re
 import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from typing import Optional
 from .base_strategy import BaseStrategy
 
 
+TITLE_END_RE = re.compile(rb'</title\s*>', re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+
+class TitleParser(HTMLParser):
+    """只提取 <title> 文本的轻量解析器"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.in_title = False
+        self.done = False
+        self.parts = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title' and not self.done:
+            self.in_title = True
+    
+    def handle_endtag(self, tag):
+        if tag == 'title' and self.in_title:
+            self.in_title = False
+            self.done = True
+    
+    def handle_data(self, data):
+        if self.in_title:
+            self.parts.append(data)
+    
+    @property
+    def title(self) -> Optional[str]:
+        title = ''.join(self.parts).strip()
+        return title or None
+
+
 class WebpageStrategy(BaseStrategy):
+    def _detect_encoding(self, response, head: bytes) -> str:
+        content_type = response.headers.get('Content-Type', '')
+        if 'charset=' in content_type.lower():
+            return response.encoding
+        
+        match = META_CHARSET_RE.search(head)
+        if match:
+            return match.group(1).decode('ascii')
+        return 'utf-8'
+    
+    def _fetch_title(self, url: str, timeout: float, max_bytes: int) -> Optional[str]:
+        """流式读取网页，读到 </title> 或达到字节上限即停止"""
+        buffer = bytearray()
+        found_end = False
+        
+        with requests.get(url, timeout=timeout, stream=True, headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }) as response:
+            response.raise_for_status()
+            
+            for chunk in response.iter_content(chunk_size=8192):
+                # 从上一块末尾回退几个字节搜索，避免结束标签被切分在两块之间
+                search_from = max(0, len(buffer) - 16)
+                buffer.extend(chunk)
+                if TITLE_END_RE.search(buffer, search_from):
+                    found_end = True
+                    break
+                if len(buffer) >= max_bytes:
+                    break
+            
+            encoding = self._detect_encoding(response, bytes(buffer[:4096]))
+        
+        try:
+            text = bytes(buffer).decode(encoding, errors='replace')
+        except LookupError:
+            text = bytes(buffer).decode('utf-8', errors='replace')
+        
+        if found_end:
+            parser = TitleParser()
+            parser.feed(text)
+            if parser.title:
+                return parser.title
+        
+        # 标签不规范或未读到结束标签时，回退到完整的 BeautifulSoup 解析
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(text, 'html.parser')
+        if soup.title and soup.title.string:
+            return soup.title.string.strip()
+        return None
+    
     def generate_prompt(self) -> Optional[str]:
         try:
             config = self.config.get('config', {})
@@ -16,14 +99,9 @@ class WebpageStrategy(BaseStrategy):
             
             url = random.choice(urls)
             timeout = config.get('timeout', 10)
+            max_bytes = config.get('max_bytes', 65536)
             
-            response = requests.get(url, timeout=timeout, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            page_title = soup.title.string if soup.title else url
+            page_title = self._fetch_title(url, timeout, max_bytes) or url
             
             prompt_template = config.get('prompt_template', '总结这个网页标题的主题：{page_title}')
             return prompt_template.format(page_title=page_title)
@@ -0,0 +1,29 @@
+import pytest
+
+import app as keeper_app
+
+
+@pytest.fixture
+def client():
+    return keeper_app.app.test_client()
+
+
+@pytest.mark.parametrize('body', [['API-1'], 'API-1', 42])
+def test_trigger_rejects_non_object_body(client, body):
+    response = client.post('/api/trigger', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+@pytest.mark.parametrize('strategy', [['random_question'], {'type': 'random_question'}, 1])
+def test_trigger_rejects_non_string_strategy(client, strategy):
+    response = client.post('/api/trigger', json={'strategy': strategy})
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+@pytest.mark.parametrize('data', ['{bad', '{"apis": ["API-2"]'])
+def test_trigger_rejects_malformed_json(client, data):
+    response = client.post('/api/trigger', data=data, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
@@ -0,0 +1,32 @@
+import threading
+import time
+
+from strategies import feed_cache
+from strategies.feed_cache import FeedCache
+
+
+class FakeFeed(dict):
+    entries = [{'title': 'headline'}]
+
+
+def test_fetches_run_in_parallel_without_duplicates(tmp_path, monkeypatch):
+    calls = []
+
+    def parse(url, **kwargs):
+        calls.append(url)
+        time.sleep(0.3)
+        return FakeFeed()
+
+    monkeypatch.setattr(feed_cache.feedparser, 'parse', parse)
+    cache = FeedCache(str(tmp_path / 'feed_cache.json'))
+    threads = [threading.Thread(target=cache.get_titles, args=(url,)) for url in ['a', 'b', 'c', 'a', 'a']]
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started < 0.6
+    assert sorted(calls) == ['a', 'b', 'c']
+    assert cache.get_titles('a') == ['headline']
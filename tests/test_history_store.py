@@ -0,0 +1,37 @@
+import sqlite3
+import time
+
+from history_store import SCHEMA, HistoryStore
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def execute_script(path, script):
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.executescript(script)
+    finally:
+        conn.close()
+
+
+def test_writer_survives_sqlite_errors(tmp_path):
+    path = tmp_path / 'history.db'
+    store = HistoryStore(path, flush_interval=0.05)
+    try:
+        execute_script(path, 'DROP TABLE requests;')
+        store.record('random_question', {'api_name': 'API-1', 'success': True})
+        assert wait_for(lambda: store._dropped == 1)
+        assert store._thread.is_alive()
+
+        execute_script(path, SCHEMA)
+        store.record('random_question', {'api_name': 'API-2', 'success': True})
+        assert wait_for(lambda: [item['api_name'] for item in store.query()['items']] == ['API-2'])
+    finally:
+        store.close()
@@ -0,0 +1,24 @@
+import pytest
+
+import json_codec
+
+
+@pytest.fixture(params=json_codec.available_backends())
+def backend(request):
+    json_codec.set_backend(request.param)
+    yield request.param
+    json_codec.set_backend()
+
+
+def test_non_finite_floats_encode_as_null(backend):
+    assert json_codec.dumps({'a': float('nan'), 'b': [float('inf'), -float('inf')]}) == b'{"a":null,"b":[null,null]}'
+
+
+def test_non_str_keys_are_coerced(backend):
+    if backend == 'msgspec':
+        pytest.skip('msgspec only accepts str/int/float keys')
+    assert json_codec.dumps({1: 'a', 1.5: 'b', None: 'c'}) == b'{"1":"a","1.5":"b","null":"c"}'
+
+
+def test_output_is_compact_utf8(backend):
+    assert json_codec.dumps({'问题': ['答案', 1, True, None]}) == '{"问题":["答案",1,true,null]}'.encode('utf-8')
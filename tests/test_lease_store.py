@@ -0,0 +1,44 @@
+import time
+
+from lease_store import LeaseStore
+
+
+ENDPOINTS = [f'API-{i}' for i in range(20)]
+
+
+def run_once(path, ttl, owner=None):
+    """模拟一次 cron 运行：新进程获取租约后退出"""
+    store = LeaseStore(path, owner=owner, grace=0)
+    try:
+        return set(store.acquire_many({endpoint: ttl for endpoint in ENDPOINTS}))
+    finally:
+        store.leave()
+
+
+def test_sequential_runs_with_default_owner_acquire_every_endpoint(tmp_path):
+    path = tmp_path / 'leases.db'
+    assert run_once(path, 0.2) == set(ENDPOINTS)
+    time.sleep(0.3)
+    assert run_once(path, 0.2) == set(ENDPOINTS)
+
+
+def test_exited_owner_does_not_keep_its_share(tmp_path):
+    path = tmp_path / 'leases.db'
+    assert run_once(path, 0.2, owner='run-1') == set(ENDPOINTS)
+    time.sleep(0.3)
+    assert run_once(path, 0.2, owner='run-2') == set(ENDPOINTS)
+
+
+def test_live_members_split_endpoints(tmp_path):
+    path = tmp_path / 'leases.db'
+    first = LeaseStore(path, owner='replica-a', grace=60)
+    second = LeaseStore(path, owner='replica-b', grace=60)
+    first.heartbeat()
+    second.heartbeat()
+    assert set(first.acquire_many({endpoint: 0.2 for endpoint in ENDPOINTS})) == set(ENDPOINTS)
+    time.sleep(0.3)
+    taken_by_second = set(second.acquire_many({endpoint: 60 for endpoint in ENDPOINTS}))
+    taken_by_first = set(first.acquire_many({endpoint: 60 for endpoint in ENDPOINTS}))
+    assert taken_by_second and taken_by_first
+    assert taken_by_second.isdisjoint(taken_by_first)
+    assert taken_by_second | taken_by_first == set(ENDPOINTS)
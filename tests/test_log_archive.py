@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+import json_codec
+import log_archive
+from log_archive import LogArchive
+from log_writer import AsyncJSONLWriter
+
+
+def test_unknown_compression_fails_fast(tmp_path):
+    with pytest.raises(ValueError):
+        LogArchive(tmp_path / 'archive', 'request_details', compression='lz4')
+
+
+def test_writer_survives_archive_failure(tmp_path, monkeypatch):
+    archive = LogArchive(tmp_path / 'archive', 'request_details', max_bytes=200)
+
+    def fail(data, compression):
+        raise RuntimeError('compression failed')
+
+    monkeypatch.setattr(log_archive, 'compress_block', fail)
+    path = tmp_path / 'request_details.jsonl'
+    writer = AsyncJSONLWriter(path, flush_interval=0.05, archive=archive)
+    try:
+        for i in range(20):
+            writer.write(f'{{"timestamp": "2024-01-01T00:00:00", "api_name": "API-1", "i": {i}}}')
+            time.sleep(0.01)
+        time.sleep(0.3)
+        assert writer._thread.is_alive()
+    finally:
+        writer.close()
+
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 20
+    assert not archive.pending_path(path).exists()
+    assert list((tmp_path / 'archive').iterdir()) == []
+
+
+def test_read_block_keeps_unicode_line_separators(tmp_path):
+    archive = LogArchive(tmp_path / 'archive', 'request_details', block_lines=10)
+    path = tmp_path / 'request_details.jsonl'
+    records = [
+        json_codec.dumps_str({'timestamp': '2024-01-01T00:00:00', 'api_name': 'API-1',
+                              'response': 'a\u2028b\u2029c\x85d\x1ce'}),
+        json_codec.dumps_str({'timestamp': '2024-01-01T00:00:01', 'api_name': 'API-2', 'response': 'plain'})
+    ]
+    path.write_text(''.join(record + '\n' for record in records), encoding='utf-8')
+    segment_id = archive.archive(path)
+
+    assert archive.read_lines_before(segment_id, None, 10) == (records, 0)
+    assert archive.query(api_name='API-1')['lines'] == records[:1]
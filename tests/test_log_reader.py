@@ -0,0 +1,37 @@
+import random
+
+from log_archive import LogArchive
+from log_reader import tail_lines
+
+
+def write_lines(path, lines):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+
+
+def test_pagination_across_live_file_and_archive(tmp_path):
+    archive = LogArchive(tmp_path / 'archive', 'request_details', block_lines=4)
+    path = tmp_path / 'request_details.jsonl'
+    expected = []
+    for count in (30, 25):
+        lines = [f'{{"timestamp": "2024-01-01T00:00:00", "api_name": "API-1", "i": {len(expected) + i}}}'
+                 for i in range(count)]
+        write_lines(path, lines)
+        expected.extend(lines)
+        archive.archive(path)
+    # 当前文件的行很短，字节偏移小于归档分段的行数
+    lines = [str(len(expected) + i) for i in range(6)]
+    write_lines(path, lines)
+    expected.extend(lines)
+
+    rng = random.Random(0)
+    for _ in range(50):
+        collected = []
+        cursor = None
+        while True:
+            page = tail_lines(path, rng.randint(1, 8), cursor, archive)
+            collected = page['lines'] + collected
+            cursor = page['cursor']
+            if cursor is None:
+                break
+        assert collected == expected
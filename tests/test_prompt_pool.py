@@ -0,0 +1,48 @@
+import time
+
+from prompt_pool import PromptPool
+
+
+def make_pool(generated, demand=None):
+    def generate(strategy_type, strategy):
+        generated.append(strategy_type)
+        return f'prompt {len(generated)}'
+
+    return PromptPool([('random_question', None)], generate, capacity=5, max_age=600, lead_time=4,
+                      idle_timeout=0.2, demand=demand)
+
+
+def test_idle_pool_does_not_refill():
+    generated = []
+    pool = make_pool(generated)
+    try:
+        time.sleep(0.3)
+        assert generated == []
+    finally:
+        pool.close()
+
+
+def test_pool_refills_after_take_then_stops():
+    generated = []
+    pool = make_pool(generated)
+    try:
+        assert pool.take() is None
+        time.sleep(0.1)
+        assert pool.stats()['size'] == 5
+        assert pool.take() is not None
+        time.sleep(0.5)
+        count = len(generated)
+        time.sleep(0.3)
+        assert len(generated) == count
+    finally:
+        pool.close()
+
+
+def test_pool_prefills_upcoming_demand():
+    generated = []
+    pool = make_pool(generated, demand=lambda within: 3)
+    try:
+        time.sleep(0.2)
+        assert pool.stats()['size'] == 3
+    finally:
+        pool.close()